@@ -1,10 +1,15 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, json, stream_with_context
 import os
 from dotenv import load_dotenv
 from pathlib import Path
 from flask_cors import CORS
-from db import search_modules_by_code, search_modules_by_name, get_module_info_with_iterations, get_all_courses, like_or_dislike_review, report_review, submit_review, get_pending_reviews, get_rejected_reviews, accept_review, reject_review
+from db import search_modules_by_code, search_modules_by_name, get_module_info_with_iterations, get_related_modules, get_course_modules, iter_all_modules, iter_all_courses, iter_pending_reviews, like_or_dislike_review, report_review, submit_review, get_rejected_reviews, accept_review, reject_review, accept_reviews, reject_reviews
 from lib import sentiment_review
+from export import export_reviews
+import metrics
+import ratelimit
+import routing
+from jsonstream import iter_json_list
 
 # Load .env from repo root if present so frontend and backend can share the same env file.
 # Fallback to default behaviour (load from CWD) if repo-root .env is not present.
@@ -17,6 +22,41 @@ else:
 
 app = Flask(__name__)
 CORS(app, origins=f"http://{os.getenv('FRONTEND_ADDRESS')}:{os.getenv('FRONTEND_PORT')}")
+metrics.init_app(app)
+routing.init_app(app)
+
+# Seconds browsers and proxies may reuse a course's module listing without revalidating
+COURSE_MODULES_MAX_AGE = int(os.getenv("COURSE_MODULES_MAX_AGE", "300"))
+COURSE_MODULES_PAGE_SIZE = 50
+COURSE_MODULES_MAX_PAGE_SIZE = 200
+
+
+def stream_json_list(key, rows):
+    """
+    Build a streamed response of the form {"<key>": [...]} from a row iterator.
+
+    The first row is fetched before the response starts, so connection and
+    query errors still surface as a normal error response. After that the
+    array is written incrementally, STREAM_CHUNK_ROWS rows per chunk.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+
+    def remaining():
+        if first is not None:
+            yield first
+            yield from rows
+
+    chunks = iter_json_list(key, remaining(), json.dumps)
+    return Response(stream_with_context(chunks), status=200, mimetype="application/json")
+
+
+def cacheable_json(payload, max_age):
+    """JSON response with an ETag and Cache-Control; a matching If-None-Match gets a 304."""
+    response = jsonify(payload)
+    response.add_etag()
+    response.headers["Cache-Control"] = f"public, max-age={max_age}"
+    return response.make_conditional(request)
 
 
 @app.route("/api/health")
@@ -38,6 +78,9 @@ def search_modules_route():
         if not search_term:
             return jsonify({"modules": []}), 200
 
+        if search_term == '*':
+            return stream_json_list("modules", iter_all_modules())
+
         modules = search_modules_by_name(search_term)
         return jsonify({"modules": modules}), 200
     except Exception as e:
@@ -46,8 +89,22 @@ def search_modules_route():
 @app.route("/api/courses")
 def get_courses_route():
     try:
-        courses = get_all_courses()
-        return jsonify({"courses": courses}), 200
+        return stream_json_list("courses", iter_all_courses())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/courses/<course_id>/modules")
+def get_course_modules_route(course_id):
+    try:
+        year = request.args.get("year") or None
+        page = max(1, int(request.args.get("page", 1)))
+        page_size = min(max(1, int(request.args.get("page_size", COURSE_MODULES_PAGE_SIZE))), COURSE_MODULES_MAX_PAGE_SIZE)
+        result = get_course_modules(course_id, year, page, page_size)
+
+        if result is None:
+            return jsonify({"error": "Course not found"}), 404
+
+        return cacheable_json(result, COURSE_MODULES_MAX_AGE)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -63,7 +120,21 @@ def get_module_info_route(module_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@app.route("/api/relatedModules/<module_id>")
+def get_related_modules_route(module_id):
+    try:
+        limit = min(int(request.args.get("limit", 10)), 50)
+        modules = get_related_modules(module_id, limit)
+
+        if modules is None:
+            return jsonify({"error": "Module not found"}), 404
+
+        return jsonify({"modules": modules}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
 @app.route("/api/likeReview/<review_id>/<like_or_dislike>")
+@ratelimit.limit("like", review_arg="review_id")
 def like_review_route(review_id, like_or_dislike):
     try:
         # Convert string to boolean
@@ -75,6 +146,7 @@ def like_review_route(review_id, like_or_dislike):
         return jsonify({"error": str(e)}), 400
 
 @app.route("/api/reportReview/<review_id>")
+@ratelimit.limit("report", review_arg="review_id")
 def report_review_route(review_id):
     try:
         # Call the database function to report the review
@@ -84,6 +156,8 @@ def report_review_route(review_id):
         return jsonify({"error": str(e)}), 400
     
 @app.route("/api/submitReview/<module_iteration_id>", methods=["POST"])
+@ratelimit.limit("submit")
+@ratelimit.idempotent_submission
 def submit_review_route(module_iteration_id):
     try:
         rating = request.args.get("overall_rating")
@@ -102,8 +176,7 @@ def get_user():
 @app.route("/api/admin/pendingReviews")
 def get_pending_reviews_route():
     try:
-        reviews = get_pending_reviews()
-        return jsonify({"reviews": reviews}), 200
+        return stream_json_list("reviews", iter_pending_reviews())
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -131,6 +204,50 @@ def reject_review_route(review_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@app.route("/api/admin/acceptReviews", methods=["POST"])
+def accept_reviews_route():
+    try:
+        criteria = request.get_json(silent=True) or {}
+        result = accept_reviews(
+            review_ids=criteria.get("review_ids"),
+            module_id=criteria.get("module_id"),
+            older_than_days=criteria.get("older_than_days"),
+            min_report_count=criteria.get("min_report_count"),
+        )
+        return jsonify({"result": result}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/admin/rejectReviews", methods=["POST"])
+def reject_reviews_route():
+    try:
+        criteria = request.get_json(silent=True) or {}
+        result = reject_reviews(
+            review_ids=criteria.get("review_ids"),
+            module_id=criteria.get("module_id"),
+            older_than_days=criteria.get("older_than_days"),
+            min_report_count=criteria.get("min_report_count"),
+        )
+        return jsonify({"result": result}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/admin/exportReviews")
+def export_reviews_route():
+    try:
+        export = export_reviews(
+            request.args.get("format", "ndjson"),
+            since=request.args.get("since") or None,
+            until=request.args.get("until") or None,
+            status=request.args.get("status") or None,
+        )
+        response = Response(export["chunks"], status=200, mimetype=export["content_type"])
+        response.headers["Content-Disposition"] = f'attachment; filename="reviews.{export["extension"]}"'
+        response.headers["X-Export-Watermark"] = export["watermark"]
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
 
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
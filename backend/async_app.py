@@ -0,0 +1,282 @@
+"""Async variant of app.py, serving the same routes on Quart.
+
+Run with an ASGI server, e.g.:
+
+    hypercorn async_app:app --bind 0.0.0.0:5001
+
+Database access goes through async_db (psycopg 3 pool) and sentiment checks
+through lib.async_sentiment_review, so a single process can keep many requests
+in flight while they wait on Postgres or Gemini.
+"""
+
+from quart import Quart, Response, request, jsonify
+import hashlib
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+from quart_cors import cors
+import async_db
+import metrics
+import ratelimit
+import routing
+from jsonstream import JsonListEncoder
+from quart.utils import run_sync, run_sync_iterable
+from lib import async_sentiment_review
+from export import export_reviews
+
+# Load .env from repo root if present so frontend and backend can share the same env file.
+# Fallback to default behaviour (load from CWD) if repo-root .env is not present.
+repo_root = Path(__file__).resolve().parents[1]
+env_path = repo_root / '.env'
+if env_path.exists():
+    load_dotenv(dotenv_path=env_path)
+else:
+    load_dotenv()
+
+app = Quart(__name__)
+app = cors(app, allow_origin=f"http://{os.getenv('FRONTEND_ADDRESS')}:{os.getenv('FRONTEND_PORT')}")
+metrics.init_async_app(app)
+routing.init_async_app(app)
+
+# Seconds browsers and proxies may reuse a course's module listing without revalidating
+COURSE_MODULES_MAX_AGE = int(os.getenv("COURSE_MODULES_MAX_AGE", "300"))
+COURSE_MODULES_PAGE_SIZE = 50
+COURSE_MODULES_MAX_PAGE_SIZE = 200
+
+
+@app.before_serving
+async def open_db_pool():
+    await async_db.open_pool()
+
+
+@app.after_serving
+async def close_db_pool():
+    await async_db.close_pool()
+
+
+async def stream_json_list(key, rows):
+    """
+    Build a streamed response of the form {"<key>": [...]} from an async row iterator.
+
+    Same contract as app.stream_json_list: the first row is fetched before the
+    response starts, so errors up to that point become a normal error response.
+    """
+    first = await anext(rows, None)
+
+    async def generate():
+        encoder = JsonListEncoder(key, app.json.dumps)
+        yield encoder.start()
+        if first is not None:
+            chunk = encoder.add(first)
+            if chunk is not None:
+                yield chunk
+            async for row in rows:
+                chunk = encoder.add(row)
+                if chunk is not None:
+                    yield chunk
+        yield encoder.finish()
+
+    return Response(generate(), status=200, mimetype="application/json")
+
+
+async def cacheable_json(payload, max_age):
+    """JSON response with an ETag and Cache-Control; a matching If-None-Match gets a 304."""
+    response = jsonify(payload)
+    etag = hashlib.sha1(await response.get_data()).hexdigest()
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"public, max-age={max_age}"
+    if request.if_none_match.contains(etag):
+        response.set_data(b"")
+        response.status_code = 304
+    return response
+
+
+@app.route("/api/health")
+async def health():
+    return jsonify({"status": "ok"}), 200
+
+@app.route("/api/searchModulesByCode/<module_code>")
+async def search_modules_by_code_route(module_code):
+    try:
+        modules = await async_db.search_modules_by_code(module_code)
+        return jsonify({"modules": modules}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/searchModules")
+async def search_modules_route():
+    try:
+        search_term = request.args.get('q', '')
+        if not search_term:
+            return jsonify({"modules": []}), 200
+
+        if search_term == '*':
+            return await stream_json_list("modules", async_db.iter_all_modules())
+
+        modules = await async_db.search_modules_by_name(search_term)
+        return jsonify({"modules": modules}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/courses")
+async def get_courses_route():
+    try:
+        return await stream_json_list("courses", async_db.iter_all_courses())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/courses/<course_id>/modules")
+async def get_course_modules_route(course_id):
+    try:
+        year = request.args.get("year") or None
+        page = max(1, int(request.args.get("page", 1)))
+        page_size = min(max(1, int(request.args.get("page_size", COURSE_MODULES_PAGE_SIZE))), COURSE_MODULES_MAX_PAGE_SIZE)
+        result = await async_db.get_course_modules(course_id, year, page, page_size)
+
+        if result is None:
+            return jsonify({"error": "Course not found"}), 404
+
+        return await cacheable_json(result, COURSE_MODULES_MAX_AGE)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/getModuleInfo/<module_id>")
+async def get_module_info_route(module_id):
+    try:
+        years_info = await async_db.get_module_info_with_iterations(module_id)
+
+        if years_info is None:
+            return jsonify({"error": "Module not found"}), 404
+
+        return jsonify({"yearsInfo": years_info}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/relatedModules/<module_id>")
+async def get_related_modules_route(module_id):
+    try:
+        limit = min(int(request.args.get("limit", 10)), 50)
+        modules = await async_db.get_related_modules(module_id, limit)
+
+        if modules is None:
+            return jsonify({"error": "Module not found"}), 404
+
+        return jsonify({"modules": modules}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/likeReview/<review_id>/<like_or_dislike>")
+@ratelimit.async_limit("like", review_arg="review_id")
+async def like_review_route(review_id, like_or_dislike):
+    try:
+        like_bool = like_or_dislike.lower() == 'true'
+        result = await async_db.like_or_dislike_review(review_id, like_bool)
+        return jsonify({"result": result}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/reportReview/<review_id>")
+@ratelimit.async_limit("report", review_arg="review_id")
+async def report_review_route(review_id):
+    try:
+        result = await async_db.report_review(review_id)
+        return jsonify({"result": result}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/submitReview/<module_iteration_id>", methods=["POST"])
+@ratelimit.async_limit("submit")
+@ratelimit.async_idempotent_submission
+async def submit_review_route(module_iteration_id):
+    try:
+        rating = request.args.get("overall_rating")
+        text = (await request.form).get("reviewText")
+        reasonable = await async_sentiment_review(text)
+        result = await async_db.submit_review(module_iteration_id, text, rating, reasonable)
+        return jsonify({"result": result}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/user")
+async def get_user():
+    # TODO: Implement authentication with a local auth system
+    return jsonify({"error": "Authentication not yet implemented"}), 501
+
+@app.route("/api/admin/pendingReviews")
+async def get_pending_reviews_route():
+    try:
+        return await stream_json_list("reviews", async_db.iter_pending_reviews())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/admin/rejectedReviews")
+async def get_rejected_reviews_route():
+    try:
+        reviews = await async_db.get_rejected_reviews()
+        return jsonify({"reviews": reviews}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/admin/acceptReview/<review_id>", methods=["POST"])
+async def accept_review_route(review_id):
+    try:
+        result = await async_db.accept_review(review_id)
+        return jsonify({"result": result}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/admin/rejectReview/<review_id>", methods=["POST"])
+async def reject_review_route(review_id):
+    try:
+        result = await async_db.reject_review(review_id)
+        return jsonify({"result": result}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/admin/acceptReviews", methods=["POST"])
+async def accept_reviews_route():
+    try:
+        criteria = (await request.get_json(silent=True)) or {}
+        result = await async_db.accept_reviews(
+            review_ids=criteria.get("review_ids"),
+            module_id=criteria.get("module_id"),
+            older_than_days=criteria.get("older_than_days"),
+            min_report_count=criteria.get("min_report_count"),
+        )
+        return jsonify({"result": result}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/admin/rejectReviews", methods=["POST"])
+async def reject_reviews_route():
+    try:
+        criteria = (await request.get_json(silent=True)) or {}
+        result = await async_db.reject_reviews(
+            review_ids=criteria.get("review_ids"),
+            module_id=criteria.get("module_id"),
+            older_than_days=criteria.get("older_than_days"),
+            min_report_count=criteria.get("min_report_count"),
+        )
+        return jsonify({"result": result}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/admin/exportReviews")
+async def export_reviews_route():
+    try:
+        export = await run_sync(export_reviews)(
+            request.args.get("format", "ndjson"),
+            since=request.args.get("since") or None,
+            until=request.args.get("until") or None,
+            status=request.args.get("status") or None,
+        )
+        response = Response(run_sync_iterable(export["chunks"]), status=200, mimetype=export["content_type"])
+        response.headers["Content-Disposition"] = f'attachment; filename="reviews.{export["extension"]}"'
+        response.headers["X-Export-Watermark"] = export["watermark"]
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+if __name__ == "__main__":
+    app.run(debug=True, host="0.0.0.0", port=int(os.getenv("ASYNC_PORT", 5001)))
@@ -0,0 +1,315 @@
+"""Async database helper functions for module_guide.
+
+Mirrors db.py on top of psycopg 3 async connection pools, so the async app can
+hold many in-flight requests while waiting on Postgres. Query text is shared
+with db.py through queries.py. As in db.py, reads go to a healthy replica from
+DATABASE_REPLICA_URLS when there is one (see routing.py).
+"""
+
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+
+from psycopg import AsyncCursor, AsyncServerCursor
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+import metrics
+import queries
+import routing
+from db import bulk_moderation_params, bulk_moderation_results, course_modules_page
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+
+
+class TimedAsyncCursor(metrics.TimedAsyncCursorMixin, AsyncCursor):
+    pass
+
+
+class TimedAsyncServerCursor(metrics.TimedAsyncCursorMixin, AsyncServerCursor):
+    pass
+
+
+async def _configure_connection(conn):
+    conn.cursor_factory = TimedAsyncCursor
+    conn.server_cursor_factory = TimedAsyncServerCursor
+
+
+def _make_pool(url):
+    return AsyncConnectionPool(
+        url,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        kwargs={"row_factory": dict_row},
+        configure=_configure_connection,
+        open=False,
+    )
+
+
+pool = _make_pool(DATABASE_URL)
+replica_pools = {url: _make_pool(url) for url in DATABASE_REPLICA_URLS}
+router = routing.AsyncReplicaRouter(pool, replica_pools)
+
+
+async def open_pool():
+    """Open the connection pools. Must be called from the serving event loop."""
+    await pool.open()
+    for replica_pool in replica_pools.values():
+        # A replica that is down is retried in the background and skipped until then
+        await replica_pool.open(wait=False)
+
+
+async def close_pool():
+    """Close the connection pools."""
+    await pool.close()
+    for replica_pool in replica_pools.values():
+        await replica_pool.close()
+
+
+@asynccontextmanager
+async def connection(readonly=False):
+    """
+    Borrow a pooled connection, counting it against the current request like db.get_db_connection.
+
+    Args:
+        readonly (bool): The caller only reads, so a read replica may be used
+    """
+    metrics.record_connection()
+    async with router.connection(readonly) as conn:
+        yield conn
+
+
+async def fetch_all(query, params=None, readonly=True):
+    """Run a query on a pooled connection and return all rows."""
+    async with connection(readonly) as conn:
+        cur = await conn.execute(query, params)
+        return await cur.fetchall()
+
+
+async def fetch_one(query, params=None, readonly=True):
+    """Run a query on a pooled connection and return the first row."""
+    async with connection(readonly) as conn:
+        cur = await conn.execute(query, params)
+        return await cur.fetchone()
+
+
+async def stream_query(query, params=None, batch_size=None):
+    """
+    Run a query on a server-side (named) cursor and yield rows one at a time.
+
+    Args:
+        query (str): The SQL query to run
+        params (tuple): Query parameters
+        batch_size (int): Rows fetched per round trip (defaults to STREAM_BATCH_SIZE)
+
+    Yields:
+        dict: One row at a time
+    """
+    async with connection(readonly=True) as conn:
+        async with conn.cursor(name="stream_query") as cur:
+            cur.itersize = batch_size or STREAM_BATCH_SIZE
+            await cur.execute(query, params)
+            async for row in cur:
+                yield row
+
+
+async def search_modules_by_code(module_code):
+    """Search for modules by their code."""
+    return await fetch_all(queries.MODULES_BY_CODE, (module_code,))
+
+
+async def search_modules_by_name(search_term):
+    """
+    Search for modules by name, code, or lecturer.
+
+    Same result as db.search_modules_by_name, but the current year courses and
+    lecturers are aggregated in the same query, so a broad search still uses a
+    single pooled connection.
+    """
+    if search_term == '*':
+        return await fetch_all(queries.ALL_MODULES_ENRICHED)
+
+    search_pattern = f"%{search_term}%"
+    return await fetch_all(queries.SEARCH_MODULES_ENRICHED, (search_pattern, search_pattern, search_pattern))
+
+
+def iter_all_modules(batch_size=None):
+    """Stream every module with its current year courses and lecturers."""
+    return stream_query(queries.ALL_MODULES_ENRICHED, batch_size=batch_size)
+
+
+def iter_all_courses(batch_size=None):
+    """Stream all courses from a server-side cursor."""
+    return stream_query(queries.ALL_COURSES, batch_size=batch_size)
+
+
+def iter_pending_reviews(batch_size=None):
+    """Stream all reviews that need moderation from a server-side cursor."""
+    return stream_query(queries.PENDING_REVIEWS, batch_size=batch_size)
+
+
+async def get_all_courses():
+    """Get all courses."""
+    return await fetch_all(queries.ALL_COURSES)
+
+
+async def get_course_modules(course_id, year=None, page=1, page_size=50):
+    """Get one page of the modules offered on a course in a year, or None if course not found."""
+    async with connection(readonly=True) as conn:
+        cur = await conn.execute(queries.COURSE_BY_ID, (course_id,))
+        if not await cur.fetchone():
+            return None
+        if year is None:
+            cur = await conn.execute(queries.LATEST_COURSE_YEAR, (course_id,))
+            year = (await cur.fetchone())['year']
+        cur = await conn.execute(queries.COURSE_MODULES, {
+            "course_id": course_id,
+            "year": year,
+            "limit": page_size,
+            "offset": (page - 1) * page_size,
+        })
+        return course_modules_page(course_id, year, page, page_size, await cur.fetchall())
+
+
+async def _get_iteration_info(iteration_id):
+    """Fetch lecturers, courses and published reviews for one iteration concurrently."""
+    lecturers, courses, reviews = await asyncio.gather(
+        fetch_all(queries.LECTURERS_FOR_ITERATION, (iteration_id,)),
+        fetch_all(queries.COURSES_FOR_ITERATION, (iteration_id,)),
+        fetch_all(queries.PUBLISHED_REVIEWS_FOR_ITERATION, (iteration_id, 'published')),
+    )
+    return {
+        "iteration_id": iteration_id,
+        "lecturers": lecturers,
+        "courses": courses,
+        "reviews": reviews
+    }
+
+
+async def get_module_info_with_iterations(module_id):
+    """
+    Get complete module information including all iterations, lecturers, courses, and reviews.
+
+    Unlike the sync version, the per-iteration queries all run concurrently.
+
+    Args:
+        module_id (int): The module ID
+
+    Returns:
+        dict: Dictionary with yearsInfo structure or None if module not found
+    """
+    module, iterations = await asyncio.gather(
+        fetch_one(queries.MODULE_BY_ID, (module_id,)),
+        fetch_all(queries.MODULE_ITERATIONS, (module_id,)),
+    )
+
+    if not module:
+        return None
+
+    # Keep the first iteration seen for each year, as db.py does
+    first_iterations = {}
+    for iteration in iterations:
+        first_iterations.setdefault(iteration['academic_year_start_year'], iteration['id'])
+
+    infos = await asyncio.gather(*(_get_iteration_info(iteration_id) for iteration_id in first_iterations.values()))
+
+    return dict(zip(first_iterations.keys(), infos))
+
+
+async def get_related_modules(module_id, limit=10):
+    """Get the modules most similar to a module, or None if module not found."""
+    module, related = await asyncio.gather(
+        fetch_one(queries.MODULE_BY_ID, (module_id,)),
+        fetch_all(queries.RELATED_MODULES, (module_id, limit)),
+    )
+    return related if module else None
+
+
+async def like_or_dislike_review(review_id, like_or_dislike=True):
+    """Increment or decrement the like count for a review."""
+    result = await fetch_one(
+        queries.LIKE_REVIEW if like_or_dislike else queries.DISLIKE_REVIEW, (review_id,), readonly=False
+    )
+    return result['like_dislike'] if result else None
+
+
+async def report_review(review_id):
+    """Report a review, flagging it for moderation once it passes its report tolerance."""
+    async with connection() as conn:
+        await conn.execute(queries.INCREMENT_REPORT_COUNT, (review_id,))
+        cur = await conn.execute(queries.REPORT_COUNTS, (review_id,))
+        result = await cur.fetchone()
+
+        if result['report_count'] >= result['report_tolerance']:
+            await conn.execute(queries.SET_MODERATION_STATUS, ('reported', review_id))
+            await conn.execute(queries.ENQUEUE_NOTIFICATION, ('reported_review', json.dumps({"review_id": int(review_id)})))
+
+    return True
+
+
+async def submit_review(module_iteration_id, text, rating, reasonable):
+    """Submit a new review for a module iteration."""
+    async with connection() as conn:
+        await conn.execute(
+            queries.INSERT_REVIEW,
+            (module_iteration_id, rating, text, 'published' if reasonable else 'automatic_review')
+        )
+    return True
+
+
+async def get_pending_reviews():
+    """Get all reviews that need moderation (not published)."""
+    return await fetch_all(queries.PENDING_REVIEWS)
+
+
+async def get_rejected_reviews():
+    """Get all rejected reviews."""
+    return await fetch_all(queries.REJECTED_REVIEWS)
+
+
+async def accept_review(review_id):
+    """Accept a review - publish it and increase report tolerance by 2."""
+    async with connection() as conn:
+        await conn.execute(queries.ACCEPT_REVIEW, (review_id,))
+    return True
+
+
+async def reject_review(review_id):
+    """Reject a review - set status to rejected."""
+    async with connection() as conn:
+        await conn.execute(queries.REJECT_REVIEW, (review_id,))
+    return True
+
+
+async def _moderate_reviews(query, outcome, review_ids, module_id, older_than_days, min_report_count):
+    params = bulk_moderation_params(review_ids, module_id, older_than_days, min_report_count)
+
+    async with connection() as conn:
+        cur = await conn.execute(query, params)
+        updated = {row['id'] for row in await cur.fetchall()}
+
+        existing = set()
+        missing = [review_id for review_id in params['review_ids'] or [] if review_id not in updated]
+        if missing:
+            cur = await conn.execute(queries.EXISTING_REVIEW_IDS, (missing,))
+            existing = {row['id'] for row in await cur.fetchall()}
+
+    return {
+        "updated": len(updated),
+        "results": bulk_moderation_results(outcome, params['review_ids'], updated, existing)
+    }
+
+
+async def accept_reviews(review_ids=None, module_id=None, older_than_days=None, min_report_count=None):
+    """Accept every pending review matching the given criteria in one transaction."""
+    return await _moderate_reviews(queries.BULK_ACCEPT_REVIEWS, 'accepted', review_ids, module_id, older_than_days, min_report_count)
+
+
+async def reject_reviews(review_ids=None, module_id=None, older_than_days=None, min_report_count=None):
+    """Reject every pending review matching the given criteria in one transaction."""
+    return await _moderate_reviews(queries.BULK_REJECT_REVIEWS, 'rejected', review_ids, module_id, older_than_days, min_report_count)
@@ -0,0 +1,14 @@
+"""Benchmarks for the module_guide backend.
+
+Each benchmark is a standalone script, run from the backend directory against
+a local Postgres filled with synthetic data:
+
+    python -m benchmarks.datagen --scale production --seed 42
+    python -m benchmarks.micro
+    python -m benchmarks.stub_server &
+    python -m benchmarks.load --url http://localhost:5000
+    python -m benchmarks.concurrency --help
+
+Results are written as JSON to benchmarks/results/ and can be compared
+between commits with ``python -m benchmarks.results compare old.json new.json``.
+"""
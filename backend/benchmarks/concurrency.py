@@ -0,0 +1,120 @@
+"""Concurrency benchmark comparing the sync (app.py) and async (async_app.py) servers.
+
+Start both servers against the same database first, with the Gemini call
+stubbed so submissions wait a realistic time without calling the API:
+
+    python -m benchmarks.stub_server --port 5000 --llm-latency 0.3
+    python -m benchmarks.stub_server --async --port 5001 --llm-latency 0.3
+
+then run:
+
+    python -m benchmarks.concurrency --sync-url http://localhost:5000 \\
+        --async-url http://localhost:5001 --concurrency 10 100 1000
+
+For every server and concurrency level, the same request mix is replayed for
+--duration seconds by that many concurrent clients. Entries starting with
+"POST " submit a review with unique text, exercising the Gemini-bound path
+(this adds reviews to the database). Throughput and latency percentiles are
+printed and saved as JSON (see benchmarks.results).
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from benchmarks.results import save_results, summarize
+
+DEFAULT_PATHS = [
+    "/api/getModuleInfo/1",
+    "/api/getModuleInfo/2",
+    "/api/searchModules?q=comp",
+    "/api/searchModulesByCode/COMP40001",
+    "POST /api/submitReview/1?overall_rating=4",
+]
+
+
+async def _client(client, base_url, paths, deadline, latencies, errors, rng):
+    while time.perf_counter() < deadline:
+        path = rng.choice(paths)
+        start = time.perf_counter()
+        try:
+            if path.startswith("POST "):
+                text = f"Concurrency benchmark review {rng.getrandbits(64):x}."
+                response = await client.post(base_url + path[5:], data={"reviewText": text})
+            else:
+                response = await client.get(base_url + path)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+            else:
+                latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+
+
+async def run_level(base_url, paths, concurrency, duration, seed):
+    """Run one server at one concurrency level and return its summary."""
+    latencies = []
+    errors = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(
+            _client(client, base_url, paths, deadline, latencies, errors, random.Random(seed + i))
+            for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency": summarize(latencies),
+    }
+
+
+async def run(args):
+    servers = {}
+    if args.sync_url:
+        servers["sync"] = args.sync_url.rstrip("/")
+    if args.async_url:
+        servers["async"] = args.async_url.rstrip("/")
+
+    results = {name: [] for name in servers}
+    for concurrency in args.concurrency:
+        for name, base_url in servers.items():
+            summary = await run_level(base_url, args.paths, concurrency, args.duration, args.seed)
+            results[name].append(summary)
+            latency = summary["latency"]
+            print(
+                f"{name:>5} c={concurrency:<5} {summary['throughput_rps']:>9} req/s  "
+                f"p50={latency.get('p50_ms')}ms p95={latency.get('p95_ms')}ms p99={latency.get('p99_ms')}ms  "
+                f"errors={summary['errors']}"
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sync-url", default="http://localhost:5000")
+    parser.add_argument("--async-url", default="http://localhost:5001")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per server and level")
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results to this file instead of results/")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    path = save_results("concurrency", vars(args), results, args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Seeded synthetic data generator for benchmarking at production scale.
+
+Replaces the contents of the database pointed to by DATABASE_URL with a
+deterministic synthetic catalogue: departments, lecturers, modules, courses,
+many academic years of module iterations with their lecturer/course links,
+and millions of reviews. Rows are streamed into Postgres with COPY, so memory
+use does not grow with the number of reviews.
+
+    DATABASE_URL=postgresql://... python -m benchmarks.datagen --scale production --seed 42
+
+The same scale and seed always produce the same data, so results from
+different commits are comparable.
+"""
+
+import argparse
+import datetime
+import itertools
+import random
+import time
+
+from db import get_db_connection, refresh_course_modules
+from related import refresh_related_modules
+
+SCALES = {
+    "small": {"departments": 5, "lecturers": 100, "modules": 200, "courses": 20, "years": 3, "reviews": 10_000},
+    "medium": {"departments": 20, "lecturers": 1_000, "modules": 2_000, "courses": 150, "years": 6, "reviews": 250_000},
+    "large": {"departments": 30, "lecturers": 2_500, "modules": 5_000, "courses": 300, "years": 8, "reviews": 1_000_000},
+    "production": {"departments": 40, "lecturers": 4_000, "modules": 8_000, "courses": 500, "years": 10, "reviews": 3_000_000},
+}
+
+LAST_YEAR = 2024
+
+SUBJECTS = [
+    "Computer Science", "Mathematics", "Physics", "Chemistry", "Engineering", "Business", "Economics",
+    "History", "Philosophy", "Biology", "Geography", "Law", "Music", "Psychology", "Linguistics",
+]
+TOPICS = [
+    "Introduction to", "Advanced", "Foundations of", "Topics in", "Applied", "Theory of", "Methods in",
+    "Principles of", "Computational", "Experimental",
+]
+AREAS = [
+    "Algorithms", "Systems", "Analysis", "Statistics", "Networks", "Optimisation", "Modelling", "Security",
+    "Learning", "Logic", "Mechanics", "Design", "Data", "Ethics", "Markets", "Signals", "Structures",
+]
+FIRST_NAMES = ["Sarah", "Michael", "Emily", "James", "Aisha", "Robert", "Lisa", "David", "Maria", "Wei", "Olu", "Anna"]
+LAST_NAMES = ["Johnson", "Chen", "Rodriguez", "Wilson", "Patel", "Taylor", "Anderson", "Smith", "Nguyen", "Okafor"]
+REVIEW_PHRASES = [
+    "Great lectures and clear notes.", "The coursework was heavy but fair.", "Exams were harder than expected.",
+    "Really enjoyed the labs.", "Could be better organised.", "The lecturer was very approachable.",
+    "Content felt dated in places.", "Would recommend to anyone interested in the area.",
+    "Problem sheets were the most useful part.", "Pace was quite fast towards the end.",
+]
+# (moderation_status, weight)
+STATUSES = [("published", 90), ("automatic_review", 5), ("reported", 3), ("rejected", 2)]
+
+TABLES = [
+    "reviews",
+    "module_iterations_courses_links",
+    "module_iterations_lecturers_links",
+    "module_iterations",
+    "modules",
+    "courses",
+    "lecturers",
+    "departments",
+]
+
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class CopyStream:
+    """File-like object that serves rows to ``copy_expert`` in COPY text format, on demand."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = bytearray()
+        self.count = 0
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += ("\t".join(_copy_value(v) for v in row) + "\n").encode()
+            self.count += 1
+        if size < 0:
+            size = len(self._buffer)
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+    readline = read
+
+
+def copy_rows(cur, table, columns, rows):
+    """COPY an iterable of row tuples into a table and return the number of rows."""
+    stream = CopyStream(rows)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", stream, size=1 << 16)
+    return stream.count
+
+
+class Catalogue:
+    """Deterministic description of the synthetic catalogue for one scale and seed."""
+
+    def __init__(self, scale, seed):
+        self.scale = scale
+        self.seed = seed
+        self.years = [str(year) for year in range(LAST_YEAR - scale["years"] + 1, LAST_YEAR + 1)]
+        rng = random.Random(seed)
+
+        self.module_departments = [rng.randint(1, scale["departments"]) for _ in range(scale["modules"])]
+        self.course_departments = [rng.randint(1, scale["departments"]) for _ in range(scale["courses"])]
+
+        courses_by_department = {}
+        for course_id, department_id in enumerate(self.course_departments, start=1):
+            courses_by_department.setdefault(department_id, []).append(course_id)
+
+        # (iteration_id, module_id, year, lecturer_ids, course_ids)
+        self.iterations = []
+        iteration_id = 0
+        for module_id, department_id in enumerate(self.module_departments, start=1):
+            # Most modules still run; some were discontinued or are new
+            first = rng.randint(0, len(self.years) - 1) if rng.random() < 0.3 else 0
+            last = len(self.years) - 1 if rng.random() < 0.85 else rng.randint(first, len(self.years) - 1)
+            lecturers = rng.sample(range(1, scale["lecturers"] + 1), rng.randint(1, 3))
+            home_courses = courses_by_department.get(department_id) or [rng.randint(1, scale["courses"])]
+            courses = sorted(set(rng.choices(home_courses, k=rng.randint(1, 4))) | {rng.randint(1, scale["courses"])})
+            for year in self.years[first:last + 1]:
+                iteration_id += 1
+                if rng.random() < 0.2:
+                    lecturers = rng.sample(range(1, scale["lecturers"] + 1), rng.randint(1, 3))
+                self.iterations.append((iteration_id, module_id, year, tuple(lecturers), tuple(courses)))
+
+    def departments(self):
+        for department_id in range(1, self.scale["departments"] + 1):
+            subject = SUBJECTS[(department_id - 1) % len(SUBJECTS)]
+            suffix = "" if department_id <= len(SUBJECTS) else f" {department_id // len(SUBJECTS) + 1}"
+            yield (department_id, subject + suffix)
+
+    def lecturers(self):
+        rng = random.Random(self.seed + 1)
+        for lecturer_id in range(1, self.scale["lecturers"] + 1):
+            title = rng.choice(["Dr.", "Prof."])
+            yield (lecturer_id, f"{title} {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {lecturer_id}")
+
+    def modules(self):
+        rng = random.Random(self.seed + 2)
+        for module_id, department_id in enumerate(self.module_departments, start=1):
+            prefix = SUBJECTS[(department_id - 1) % len(SUBJECTS)][:4].upper()
+            level = rng.randint(4, 7)
+            name = f"{rng.choice(TOPICS)} {rng.choice(AREAS)} {module_id}"
+            yield (module_id, department_id, f"{prefix}{level}{module_id:05d}", name, rng.choice([10, 15, 20, 30]))
+
+    def courses(self):
+        rng = random.Random(self.seed + 3)
+        for course_id, department_id in enumerate(self.course_departments, start=1):
+            subject = SUBJECTS[(department_id - 1) % len(SUBJECTS)]
+            yield (course_id, department_id, f"{rng.choice(['BSc', 'MSci', 'MEng', 'BA'])} {subject} {course_id}")
+
+    def module_iterations(self):
+        for iteration_id, module_id, year, _, _ in self.iterations:
+            yield (iteration_id, module_id, year)
+
+    def lecturer_links(self):
+        link_id = itertools.count(1)
+        for iteration_id, _, _, lecturers, _ in self.iterations:
+            for lecturer_id in lecturers:
+                yield (next(link_id), iteration_id, lecturer_id)
+
+    def course_links(self):
+        link_id = itertools.count(1)
+        for iteration_id, _, _, _, courses in self.iterations:
+            for course_id in courses:
+                yield (next(link_id), iteration_id, course_id)
+
+    def reviews(self, batch_size=10_000):
+        rng = random.Random(self.seed + 4)
+        # Popular modules attract far more reviews than niche ones
+        weights = list(itertools.accumulate(1.0 / (1 + (i % 97)) for i in range(len(self.iterations))))
+        statuses = [status for status, _ in STATUSES]
+        status_weights = [weight for _, weight in STATUSES]
+        remaining = self.scale["reviews"]
+        review_id = 0
+        while remaining > 0:
+            count = min(batch_size, remaining)
+            remaining -= count
+            picks = rng.choices(self.iterations, cum_weights=weights, k=count)
+            picked_statuses = rng.choices(statuses, weights=status_weights, k=count)
+            for (iteration_id, _, year, _, _), status in zip(picks, picked_statuses):
+                review_id += 1
+                created_at = datetime.datetime(int(year), 10, 1) + datetime.timedelta(seconds=rng.randrange(300 * 86400))
+                report_count = rng.randint(1, 5) if status == "reported" else rng.choice([0, 0, 0, 1])
+                yield (
+                    review_id,
+                    iteration_id,
+                    rng.randint(1, 5),
+                    " ".join(rng.sample(REVIEW_PHRASES, rng.randint(1, 3))),
+                    created_at.isoformat(sep=" "),
+                    status,
+                    1,
+                    report_count,
+                    rng.randint(-5, 40),
+                )
+
+
+def generate(conn, scale, seed):
+    """
+    Replace the database contents with a synthetic catalogue.
+
+    Args:
+        conn: psycopg2 connection
+        scale (dict): Row counts, see SCALES
+        seed (int): Random seed
+
+    Returns:
+        dict: Rows loaded and seconds taken per table
+    """
+    catalogue = Catalogue(scale, seed)
+    cur = conn.cursor()
+    cur.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+
+    loads = [
+        ("departments", ("id", "name"), catalogue.departments()),
+        ("lecturers", ("id", "name"), catalogue.lecturers()),
+        ("modules", ("id", "department_id", "code", "name", "credits"), catalogue.modules()),
+        ("courses", ("id", "home_department_id", "title"), catalogue.courses()),
+        ("module_iterations", ("id", "module_id", "academic_year_start_year"), catalogue.module_iterations()),
+        ("module_iterations_lecturers_links", ("id", "module_iteration_id", "lecturer_id"), catalogue.lecturer_links()),
+        ("module_iterations_courses_links", ("id", "module_iteration_id", "course_id"), catalogue.course_links()),
+        ("reviews", ("id", "module_iteration_id", "overall_rating", "comment", "created_at", "moderation_status",
+                     "report_tolerance", "report_count", "like_dislike"), catalogue.reviews()),
+    ]
+
+    summary = {}
+    for table, columns, rows in loads:
+        start = time.perf_counter()
+        count = copy_rows(cur, table, columns, rows)
+        cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), GREATEST(MAX(id), 1)) FROM {table}")
+        elapsed = time.perf_counter() - start
+        summary[table] = {"rows": count, "seconds": round(elapsed, 3)}
+        print(f"{table:<36} {count:>10} rows  {elapsed:8.2f}s")
+
+    conn.commit()
+    start = time.perf_counter()
+    refresh_course_modules(conn)
+    print(f"{'course_module_iterations':<36} {'refreshed':>15}  {time.perf_counter() - start:8.2f}s")
+
+    # TRUNCATE ... CASCADE emptied related_modules along with modules
+    start = time.perf_counter()
+    related = refresh_related_modules()
+    print(f"{'related_modules':<36} {related['rows']:>10} rows  {time.perf_counter() - start:8.2f}s")
+
+    cur.execute("ANALYZE")
+    conn.commit()
+    cur.close()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    for key in SCALES["small"]:
+        parser.add_argument(f"--{key}", type=int, help=f"Override the number of {key}")
+    args = parser.parse_args()
+
+    scale = dict(SCALES[args.scale])
+    for key in scale:
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+
+    conn = get_db_connection()
+    try:
+        generate(conn, scale, args.seed)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Throughput and memory of review exports.
+
+Runs export.export_reviews in each format against the database at
+DATABASE_URL and records rows/s, MB/s and peak Python allocations. The
+"incremental" case exports only the newest 1% of reviews, starting from a
+created_at watermark. Load a million reviews first:
+
+    python -m benchmarks.datagen --scale large --seed 42
+    python -m benchmarks.export --formats ndjson csv parquet --batch-size 10000
+
+Output is counted and discarded unless --output-dir is given.
+"""
+
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+
+import db
+import export
+from benchmarks.results import save_results
+
+
+def incremental_watermark(fraction):
+    """created_at value after which roughly ``fraction`` of reviews were created."""
+    conn = db.get_db_connection(readonly=True)
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT percentile_disc(%s) WITHIN GROUP (ORDER BY created_at) FROM reviews", (1 - fraction,)
+    )
+    watermark = cur.fetchone()[0]
+    cur.close()
+    conn.close()
+    return watermark
+
+
+def run_export(export_format, batch_size, since=None, output=None):
+    """Run one export to completion and summarise it."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = export.export_reviews(export_format, since=since, batch_size=batch_size)
+    first_chunk = None
+    sink = open(output, "wb") if output else None
+    try:
+        for chunk in result["chunks"]:
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            if sink:
+                sink.write(chunk)
+    finally:
+        if sink:
+            sink.close()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rows, size = result["stats"]["rows"], result["stats"]["bytes"]
+    return {
+        "rows": rows,
+        "bytes": size,
+        "seconds": round(elapsed, 3),
+        "first_chunk_ms": round((first_chunk or elapsed) * 1000, 1),
+        "rows_per_second": round(rows / elapsed),
+        "mb_per_second": round(size / elapsed / 2**20, 2),
+        "peak_python_mib": round(peak / 2**20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--formats", nargs="+", choices=sorted(export.FORMATS), default=["ndjson", "csv", "parquet"])
+    parser.add_argument("--batch-size", type=int, default=export.EXPORT_BATCH_SIZE)
+    parser.add_argument("--incremental-fraction", type=float, default=0.01)
+    parser.add_argument("--output-dir", help="Write each export here instead of discarding it")
+    parser.add_argument("--output", help="Write results to this file instead of results/")
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir) if args.output_dir else None
+    if output_dir:
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    since = incremental_watermark(args.incremental_fraction)
+    results = {}
+    for export_format in args.formats:
+        extension = export.FORMATS[export_format][1]
+        for case, case_since in (("full", None), ("incremental", since)):
+            output = output_dir / f"reviews-{case}.{extension}" if output_dir else None
+            result = run_export(export_format, args.batch_size, case_since, output)
+            results[f"{export_format}_{case}"] = result
+            print(f"{export_format:<8} {case:<12} {result['rows']:>9} rows {result['seconds']:8.2f}s "
+                  f"{result['rows_per_second']:>9} rows/s {result['mb_per_second']:>7} MB/s "
+                  f"peak={result['peak_python_mib']}MiB")
+
+    path = save_results("export", {**vars(args), "since": str(since)}, results, args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""HTTP load scenario mix against a running backend.
+
+Start the backend with Gemini stubbed and rate limits lifted
+(``python -m benchmarks.stub_server``) on a database filled by
+``benchmarks.datagen``, then run:
+
+    python -m benchmarks.load --url http://localhost:5000 --concurrency 50 --duration 60
+
+Each virtual user repeatedly picks a scenario according to SCENARIOS weights,
+so the traffic resembles real usage: mostly module page views and searches,
+with a tail of likes, reports, submissions and admin queue reads. Per-scenario
+latency percentiles are printed and saved as JSON.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from benchmarks.results import save_results, summarize
+
+# (scenario, weight)
+SCENARIOS = [
+    ("module_page", 45),
+    ("search", 20),
+    ("search_by_code", 5),
+    ("courses", 5),
+    ("like", 12),
+    ("report", 3),
+    ("submit", 5),
+    ("admin_pending", 3),
+    ("admin_accept", 2),
+]
+
+SEARCH_TERMS = ["intro", "data", "systems", "advanced", "patel", "comp", "math", "learning"]
+
+
+class Targets:
+    """Ids discovered from the API to build realistic request paths."""
+
+    def __init__(self, modules, iteration_ids, review_ids):
+        self.module_ids = [module["id"] for module in modules]
+        self.module_codes = [module["code"] for module in modules]
+        self.iteration_ids = iteration_ids
+        self.review_ids = review_ids
+
+
+async def discover_targets(client, base_url, sample, rng):
+    """Read module, iteration and review ids from the API itself."""
+    response = await client.get(f"{base_url}/api/searchModules", params={"q": "*"})
+    response.raise_for_status()
+    modules = response.json()["modules"]
+
+    iteration_ids = []
+    review_ids = []
+    for module in rng.sample(modules, min(sample, len(modules))):
+        response = await client.get(f"{base_url}/api/getModuleInfo/{module['id']}")
+        if response.status_code != 200:
+            continue
+        for year_info in response.json()["yearsInfo"].values():
+            iteration_ids.append(year_info["iteration_id"])
+            review_ids.extend(review["id"] for review in year_info["reviews"])
+
+    return Targets(modules, iteration_ids, review_ids or [1])
+
+
+def build_request(scenario, targets, rng):
+    """Return (method, path, kwargs) for one request of the given scenario."""
+    if scenario == "module_page":
+        return "GET", f"/api/getModuleInfo/{rng.choice(targets.module_ids)}", {}
+    if scenario == "search":
+        return "GET", "/api/searchModules", {"params": {"q": rng.choice(SEARCH_TERMS)}}
+    if scenario == "search_by_code":
+        return "GET", f"/api/searchModulesByCode/{rng.choice(targets.module_codes)}", {}
+    if scenario == "courses":
+        return "GET", "/api/courses", {}
+    if scenario == "like":
+        return "GET", f"/api/likeReview/{rng.choice(targets.review_ids)}/{rng.random() < 0.8}", {}
+    if scenario == "report":
+        return "GET", f"/api/reportReview/{rng.choice(targets.review_ids)}", {}
+    if scenario == "submit":
+        return "POST", f"/api/submitReview/{rng.choice(targets.iteration_ids)}", {
+            "params": {"overall_rating": rng.randint(1, 5)},
+            # Unique text, so submissions are not answered as duplicates of each other
+            "data": {"reviewText": f"Load test review {rng.getrandbits(64):x}, the module was fine."},
+        }
+    if scenario == "admin_pending":
+        return "GET", "/api/admin/pendingReviews", {}
+    if scenario == "admin_accept":
+        return "POST", f"/api/admin/acceptReview/{rng.choice(targets.review_ids)}", {}
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def virtual_user(client, base_url, targets, deadline, rng, timings, errors):
+    names = [name for name, _ in SCENARIOS]
+    weights = [weight for _, weight in SCENARIOS]
+    while time.perf_counter() < deadline:
+        scenario = rng.choices(names, weights=weights)[0]
+        method, path, kwargs = build_request(scenario, targets, rng)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, base_url + path, **kwargs)
+            await response.aread()
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        if ok:
+            timings.setdefault(scenario, []).append(time.perf_counter() - start)
+        else:
+            errors[scenario] = errors.get(scenario, 0) + 1
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    base_url = args.url.rstrip("/")
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        targets = await discover_targets(client, base_url, args.discovery_sample, rng)
+
+        timings = {}
+        errors = {}
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(
+            virtual_user(client, base_url, targets, deadline, random.Random(args.seed + i + 1), timings, errors)
+            for i in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+
+    total = sum(len(values) for values in timings.values())
+    results = {
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 1),
+        "errors": errors,
+        "scenarios": {name: summarize(values) for name, values in sorted(timings.items())},
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--discovery-sample", type=int, default=200, help="Modules read to discover review ids")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results to this file instead of results/")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    print(f"{results['requests']} requests in {results['elapsed_s']}s ({results['throughput_rps']} req/s)")
+    for name, summary in results["scenarios"].items():
+        print(f"{name:<16} n={summary['count']:<7} p50={summary['p50_ms']:>9.2f}ms p95={summary['p95_ms']:>9.2f}ms "
+              f"errors={results['errors'].get(name, 0)}")
+
+    path = save_results("load", vars(args), results, args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
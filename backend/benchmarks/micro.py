@@ -0,0 +1,107 @@
+"""Micro-benchmarks for the db.py helpers.
+
+Runs each helper repeatedly against the database at DATABASE_URL (normally
+filled by ``benchmarks.datagen``) and records latency percentiles along with
+the number of connections and queries each call makes:
+
+    python -m benchmarks.micro --iterations 50
+    python -m benchmarks.micro --only get_module_info_with_iterations search_modules_by_name
+
+Write benchmarks (likes, submissions, moderation) modify the data, so re-run
+datagen before comparing results between commits.
+"""
+
+import argparse
+import random
+import time
+
+import db
+import metrics
+from benchmarks.results import save_results, summarize
+
+
+def _ids(query):
+    conn = db.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(query)
+    ids = [row[0] for row in cur.fetchall()]
+    cur.close()
+    conn.close()
+    return ids
+
+
+def build_cases(rng):
+    """Return {name: zero-argument callable} for every benchmarked helper."""
+    module_ids = _ids("SELECT id FROM modules")
+    module_codes = _ids("SELECT code FROM modules")
+    review_ids = _ids("SELECT id FROM reviews ORDER BY random() LIMIT 10000")
+    iteration_ids = _ids("SELECT id FROM module_iterations ORDER BY random() LIMIT 10000")
+    course_ids = _ids("SELECT id FROM courses")
+
+    return {
+        "search_modules_by_code": lambda: db.search_modules_by_code(rng.choice(module_codes)),
+        "search_modules_by_name": lambda: db.search_modules_by_name(rng.choice(["intro", "data", "sys", "patel"])),
+        "iter_all_modules": lambda: sum(1 for _ in db.iter_all_modules()),
+        "get_all_courses": db.get_all_courses,
+        "get_course_modules": lambda: db.get_course_modules(rng.choice(course_ids)),
+        "get_module_info_with_iterations": lambda: db.get_module_info_with_iterations(rng.choice(module_ids)),
+        "get_pending_reviews": db.get_pending_reviews,
+        "iter_pending_reviews": lambda: sum(1 for _ in db.iter_pending_reviews()),
+        "get_rejected_reviews": db.get_rejected_reviews,
+        "like_or_dislike_review": lambda: db.like_or_dislike_review(rng.choice(review_ids), rng.random() < 0.8),
+        "submit_review": lambda: db.submit_review(rng.choice(iteration_ids), "Benchmark review.", 4, True),
+        "accept_review": lambda: db.accept_review(rng.choice(review_ids)),
+        "accept_reviews": lambda: db.accept_reviews(review_ids=rng.sample(review_ids, min(100, len(review_ids)))),
+    }
+
+
+def run_case(func, iterations, warmup):
+    """Time a callable and return its summary with per-call connection and query counts."""
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    queries = 0
+    connections = 0
+    for _ in range(iterations):
+        with metrics.collect() as stats:
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        queries += stats.queries
+        connections += stats.connections
+
+    summary = summarize(timings)
+    summary["queries_per_call"] = queries / iterations
+    summary["connections_per_call"] = connections / iterations
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", help="Only run these helpers")
+    parser.add_argument("--output", help="Write results to this file instead of results/")
+    args = parser.parse_args()
+
+    cases = build_cases(random.Random(args.seed))
+    if args.only:
+        cases = {name: cases[name] for name in args.only}
+
+    results = {}
+    for name, func in cases.items():
+        results[name] = run_case(func, args.iterations, args.warmup)
+        summary = results[name]
+        print(
+            f"{name:<34} p50={summary['p50_ms']:>9.2f}ms p95={summary['p95_ms']:>9.2f}ms "
+            f"queries/call={summary['queries_per_call']:.1f} connections/call={summary['connections_per_call']:.1f}"
+        )
+
+    path = save_results("micro", vars(args), results, args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
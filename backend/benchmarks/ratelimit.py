@@ -0,0 +1,78 @@
+"""Per-request overhead of the rate limiting subsystem.
+
+Measures the cost of a single bucket check on each backend, and of a full
+like request through the Flask test client with and without the limiter:
+
+    python -m benchmarks.ratelimit --iterations 20000
+    python -m benchmarks.ratelimit --redis-url redis://localhost:6379/0
+
+No database is needed: the view's database call is replaced by a stub.
+"""
+
+import argparse
+import time
+
+import ratelimit
+from benchmarks.results import save_results, summarize
+
+
+def time_calls(func, iterations):
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(i)
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def bench_backend(backend, iterations, keys):
+    rate, capacity = ratelimit.parse_limit("1000000/1")
+    return time_calls(lambda i: backend.take(f"bench:{i % keys}", rate, capacity), iterations)
+
+
+def bench_requests(iterations):
+    import app
+
+    app.like_or_dislike_review = lambda review_id, like: 1
+    client = app.app.test_client()
+    limits = dict(ratelimit.LIMITS)
+
+    # Limits high enough that nothing is rejected, so only the bookkeeping is measured
+    ratelimit.LIMITS["like"] = ("1000000000/1", "1000000000/1")
+    limited = time_calls(lambda i: client.get(f"/api/likeReview/{i % 1000}/true"), iterations)
+
+    unlimited_view = app.like_review_route.__wrapped__
+    app.app.view_functions["like_review_route"] = unlimited_view
+    unlimited = time_calls(lambda i: client.get(f"/api/likeReview/{i % 1000}/true"), iterations)
+
+    ratelimit.LIMITS.update(limits)
+    return {"with_limiter": limited, "without_limiter": unlimited}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--keys", type=int, default=10000, help="Distinct bucket keys to cycle through")
+    parser.add_argument("--redis-url", help="Also benchmark the Redis backend")
+    parser.add_argument("--output", help="Write results to this file instead of results/")
+    args = parser.parse_args()
+
+    results = {"memory_take": bench_backend(ratelimit.MemoryBackend(), args.iterations, args.keys)}
+    if args.redis_url:
+        results["redis_take"] = bench_backend(ratelimit.RedisBackend(args.redis_url), args.iterations, args.keys)
+    results["like_request"] = bench_requests(args.iterations)
+
+    for name in ("memory_take", "redis_take"):
+        if name in results:
+            print(f"{name:<14} p50={results[name]['p50_ms']:.4f}ms p99={results[name]['p99_ms']:.4f}ms")
+    request = results["like_request"]
+    overhead = request["with_limiter"]["p50_ms"] - request["without_limiter"]["p50_ms"]
+    print(f"like request   p50 with limiter={request['with_limiter']['p50_ms']:.4f}ms "
+          f"without={request['without_limiter']['p50_ms']:.4f}ms overhead={overhead:.4f}ms")
+
+    path = save_results("ratelimit", vars(args), results, args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
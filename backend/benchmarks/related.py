@@ -0,0 +1,101 @@
+"""Build time and peak memory of the related modules builder.
+
+Generates seeded synthetic module→course and module→lecturer links in memory
+and times related.build_feature_matrix and related.top_k_neighbours on them,
+tracking peak Python/NumPy allocations with tracemalloc:
+
+    python -m benchmarks.related --modules 50000 --top-k 10
+
+No database is needed; the load and store stages of related.py are not
+included.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+import related
+from benchmarks.results import save_results
+
+
+def synthetic_links(modules, seed, courses_per_module=3, lecturers_per_module=2):
+    """
+    Build (module_ids, course_pairs, lecturer_pairs) for a catalogue of ``modules`` modules.
+
+    Modules are grouped into departments; most links stay within a module's
+    department, as in a real catalogue, so neighbourhoods are clustered.
+    """
+    rng = np.random.default_rng(seed)
+    module_ids = np.arange(1, modules + 1, dtype=np.int64)
+    departments = max(1, modules // 200)
+    courses = max(1, modules // 16)
+    lecturers = max(1, modules // 2)
+    department = rng.integers(0, departments, modules)
+
+    def links(per_module, features):
+        per_department = max(1, features // departments)
+        counts = rng.integers(1, per_module * 2, modules)
+        owners = np.repeat(module_ids, counts)
+        local = rng.random(len(owners)) < 0.85
+        features_for = np.where(
+            local,
+            np.repeat(department, counts) * per_department + rng.integers(0, per_department, len(owners)),
+            rng.integers(0, features, len(owners)),
+        )
+        return np.unique(np.column_stack([owners, features_for + 1]), axis=0)
+
+    return module_ids, links(courses_per_module, courses), links(lecturers_per_module, lecturers)
+
+
+def measure(func):
+    """Run func, returning (result, seconds, peak MiB allocated)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", type=int, default=50_000)
+    parser.add_argument("--top-k", type=int, default=related.TOP_K)
+    parser.add_argument("--chunk-size", type=int, default=related.CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results to this file instead of results/")
+    args = parser.parse_args()
+
+    module_ids, course_pairs, lecturer_pairs = synthetic_links(args.modules, args.seed)
+    print(f"{len(module_ids)} modules, {len(course_pairs)} course links, {len(lecturer_pairs)} lecturer links")
+
+    features, matrix_seconds, matrix_mib = measure(
+        lambda: related.build_feature_matrix(module_ids, course_pairs, lecturer_pairs)
+    )
+    (neighbours, scores), neighbours_seconds, neighbours_mib = measure(
+        lambda: related.top_k_neighbours(features, args.top_k, chunk_size=args.chunk_size)
+    )
+
+    found = (neighbours >= 0).sum(axis=1)
+    results = {
+        "feature_matrix": {"seconds": round(matrix_seconds, 3), "peak_mib": round(matrix_mib, 1),
+                           "shape": list(features.shape), "nnz": int(features.nnz)},
+        "top_k_neighbours": {"seconds": round(neighbours_seconds, 3), "peak_mib": round(neighbours_mib, 1)},
+        "modules_with_neighbours": int((found > 0).sum()),
+        "mean_neighbours": round(float(found.mean()), 2),
+        "mean_top_score": round(float(scores[:, 0].mean()), 4),
+    }
+
+    print(f"feature matrix   {matrix_seconds:.2f}s peak={matrix_mib:.1f}MiB nnz={features.nnz}")
+    print(f"top-k neighbours {neighbours_seconds:.2f}s peak={neighbours_mib:.1f}MiB")
+    print(f"{results['modules_with_neighbours']} modules with neighbours, {results['mean_neighbours']} on average")
+
+    path = save_results("related", vars(args), results, args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Saving and comparing benchmark results.
+
+Every benchmark writes a JSON document with the same envelope:
+
+    {"benchmark": ..., "commit": ..., "timestamp": ..., "python": ...,
+     "args": {...}, "results": {...}}
+
+Timing summaries inside "results" are produced by ``summarize``. Two result
+files from different commits can be compared with:
+
+    python -m benchmarks.results compare old.json new.json --threshold 10
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of an already sorted list."""
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(seconds):
+    """Summarise a list of durations (in seconds) as milliseconds."""
+    values = sorted(seconds)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "min_ms": round(values[0] * 1000, 3),
+        "mean_ms": round(statistics.fmean(values) * 1000, 3),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+
+def current_commit():
+    """Return the short hash of the checked out commit, or None outside git."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(benchmark, args, results, output=None):
+    """
+    Write a result document and return the path it was written to.
+
+    Args:
+        benchmark (str): Benchmark name
+        args (dict): Arguments the benchmark ran with
+        results (dict): Benchmark specific results
+        output (str): Destination file (defaults to results/<benchmark>-<commit>.json)
+
+    Returns:
+        Path: The file written
+    """
+    commit = current_commit()
+    document = {
+        "benchmark": benchmark,
+        "commit": commit,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "args": args,
+        "results": results,
+    }
+
+    if output:
+        path = Path(output)
+    else:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f"{benchmark}-{commit or 'nogit'}.json"
+
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, default=str)
+    return path
+
+
+def _flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, child in value.items():
+            yield from _flatten(child, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(value, list):
+        for i, child in enumerate(value):
+            yield from _flatten(child, f"{prefix}[{i}]")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def compare(old_path, new_path, threshold=10.0):
+    """
+    Print the relative change of every timing in two result files.
+
+    Only keys ending in ``_ms`` are compared (higher is worse). Returns the list
+    of keys that regressed by more than ``threshold`` percent.
+    """
+    with open(old_path) as f:
+        old = dict(_flatten(json.load(f)["results"]))
+    with open(new_path) as f:
+        new = dict(_flatten(json.load(f)["results"]))
+
+    regressions = []
+    for key in sorted(old.keys() & new.keys()):
+        if not key.endswith("_ms") or not old[key]:
+            continue
+        change = (new[key] - old[key]) / old[key] * 100
+        flag = ""
+        if change > threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<60} {old[key]:>10.3f} -> {new[key]:>10.3f} ms  {change:+6.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark result files.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compare_parser = subparsers.add_parser("compare")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args()
+
+    regressions = compare(args.old, args.new, args.threshold)
+    if regressions:
+        raise SystemExit(f"{len(regressions)} timings regressed by more than {args.threshold}%")
+
+
+if __name__ == "__main__":
+    main()
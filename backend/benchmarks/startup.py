@@ -0,0 +1,132 @@
+"""Startup cost of importing the backend's entry points.
+
+Imports each target in a fresh interpreter under ``python -X importtime``
+and reports the target's cumulative import time (median over --runs) and the
+slowest packages it pulls in:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --targets app db --budget-ms 300
+
+Exits with status 1 if a target is over its budget, or if it imports one of
+the packages that should only load on first use (Gemini SDK, pdfplumber,
+numpy/scipy, pyarrow), so it can gate CI.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.results import save_results
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Milliseconds of cumulative import time allowed per target
+BUDGETS_MS = {
+    "app": 400,
+    "async_app": 600,
+    "db": 150,
+    "notifications": 250,
+}
+
+# Packages that must not be imported at startup
+LAZY_PACKAGES = ["google.generativeai", "google.ai", "pdfplumber", "numpy", "scipy", "pyarrow"]
+
+
+def parse_importtime(stderr):
+    """
+    Parse ``-X importtime`` output.
+
+    Returns:
+        list: (package, self microseconds, cumulative microseconds, depth) in output order
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def import_once(target):
+    """Import target in a fresh interpreter. Returns (importtime entries, wall seconds)."""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=BACKEND_DIR, env=os.environ.copy(), capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{completed.stderr[-2000:]}")
+    return parse_importtime(completed.stderr), elapsed
+
+
+def measure(target, runs, top):
+    """Summarise the import cost of target over several fresh interpreters."""
+    import_ms = []
+    wall_ms = []
+    for _ in range(runs):
+        entries, elapsed = import_once(target)
+        import_ms.append(next(cumulative for name, _, cumulative, depth in entries if name == target and depth == 0) / 1000)
+        wall_ms.append(elapsed * 1000)
+
+    # Slowest direct and indirect imports, from the last run
+    slowest = sorted(
+        ((name, cumulative / 1000) for name, _, cumulative, depth in entries if depth == 1),
+        key=lambda item: -item[1],
+    )[:top]
+    lazy = sorted({
+        name for name, _, _, _ in entries
+        if any(name == package or name.startswith(package + ".") for package in LAZY_PACKAGES)
+    })
+    return {
+        "import_ms": round(statistics.median(import_ms), 1),
+        "wall_ms": round(statistics.median(wall_ms), 1),
+        "modules": len(entries),
+        "slowest": [{"package": name, "cumulative_ms": round(ms, 1)} for name, ms in slowest],
+        "lazy_packages_imported": lazy,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", default=list(BUDGETS_MS))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="Number of slowest imports to list per target")
+    parser.add_argument("--budget-ms", type=float, help="Budget for every target, instead of BUDGETS_MS")
+    parser.add_argument("--output", help="Write results to this file instead of results/")
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+    for target in args.targets:
+        result = measure(target, args.runs, args.top)
+        result["budget_ms"] = args.budget_ms or BUDGETS_MS.get(target)
+        results[target] = result
+
+        print(f"{target:<14} import={result['import_ms']:.1f}ms wall={result['wall_ms']:.1f}ms "
+              f"budget={result['budget_ms']}ms modules={result['modules']}")
+        for item in result["slowest"]:
+            print(f"    {item['package']:<40} {item['cumulative_ms']:8.1f}ms")
+
+        if result["budget_ms"] and result["import_ms"] > result["budget_ms"]:
+            failures.append(f"{target} took {result['import_ms']}ms to import (budget {result['budget_ms']}ms)")
+        if result["lazy_packages_imported"]:
+            failures.append(f"{target} imports {', '.join(result['lazy_packages_imported'])} at startup")
+
+    path = save_results("startup", vars(args), results, args.output)
+    print(f"Results written to {path}")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
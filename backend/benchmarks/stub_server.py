@@ -0,0 +1,70 @@
+"""Run the backend with the Gemini call replaced by a local stub.
+
+The stub answers "Yes" after --llm-latency seconds, so load tests exercise the
+submission path without network access or API costs. Load test clients all
+connect from one address, so rate limits are lifted unless --rate-limits is
+given:
+
+    python -m benchmarks.stub_server --port 5000
+    python -m benchmarks.stub_server --async --port 5001
+"""
+
+import argparse
+import asyncio
+import time
+
+import lib
+import ratelimit
+
+
+def install_stub(latency):
+    """Replace lib.query and lib.async_query with local stubs."""
+
+    def stub_query(prompt):
+        time.sleep(latency)
+        return "Yes"
+
+    async def stub_async_query(prompt):
+        await asyncio.sleep(latency)
+        return "Yes"
+
+    lib.query = stub_query
+    lib.async_query = stub_async_query
+
+
+def disable_rate_limits():
+    """Raise every limit in ratelimit.LIMITS far beyond what a load test reaches."""
+    unlimited = "1000000000/1"
+    for scope, (_, review_limit) in ratelimit.LIMITS.items():
+        ratelimit.LIMITS[scope] = (unlimited, unlimited if review_limit else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Serve async_app instead of app")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds the stubbed Gemini call takes")
+    parser.add_argument("--rate-limits", action="store_true", help="Keep the configured rate limits")
+    args = parser.parse_args()
+
+    install_stub(args.llm_latency)
+    if not args.rate_limits:
+        disable_rate_limits()
+
+    if args.use_async:
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+        from async_app import app
+
+        config = Config()
+        config.bind = [f"{args.host}:{args.port}"]
+        asyncio.run(serve(app, config))
+    else:
+        from app import app
+
+        app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,73 @@
 """Database helper functions for module_guide."""
 
+import json
 import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
-from lib import notify_admins_of_reported_review
+import metrics
+import queries
+import routing
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
 
 
-def get_db_connection():
-    """Create a new database connection."""
-    conn = psycopg2.connect(DATABASE_URL)
+def _connect(url):
+    return psycopg2.connect(url, connection_factory=metrics.InstrumentedConnection)
+
+
+router = routing.ReplicaRouter(DATABASE_URL, DATABASE_REPLICA_URLS, _connect)
+
+
+def get_db_connection(readonly=False):
+    """
+    Create a new database connection.
+
+    Args:
+        readonly (bool): The caller only reads, so a read replica may be used
+
+    Returns:
+        connection: psycopg2 connection to the primary or a replica
+    """
+    if readonly:
+        conn = router.connect_read()
+    else:
+        routing.record_write()
+        conn = router.connect_primary()
+    metrics.record_connection()
     return conn
 
 
+def stream_query(query, params=None, batch_size=None):
+    """
+    Run a query on a server-side (named) cursor and yield rows one at a time.
+
+    Rows are pulled from Postgres in batches of ``batch_size``, so memory use
+    stays flat however large the result set is. The connection is closed when
+    the generator is exhausted or closed early.
+
+    Args:
+        query (str): The SQL query to run
+        params (tuple): Query parameters
+        batch_size (int): Rows fetched per round trip (defaults to STREAM_BATCH_SIZE)
+
+    Yields:
+        dict: One row at a time
+    """
+    conn = get_db_connection(readonly=True)
+    try:
+        cur = conn.cursor(name="stream_query", cursor_factory=RealDictCursor)
+        cur.itersize = batch_size or STREAM_BATCH_SIZE
+        cur.execute(query, params)
+        for row in cur:
+            yield row
+        cur.close()
+    finally:
+        conn.close()
+
+
 def search_modules_by_code(module_code):
     """
     Search for modules by their code.
@@ -25,10 +78,10 @@ def search_modules_by_code(module_code):
     Returns:
         list: List of module dictionaries matching the code
     """
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    cur.execute("SELECT * FROM modules WHERE code = %s", (module_code,))
+    cur.execute(queries.MODULES_BY_CODE, (module_code,))
     modules = cur.fetchall()
 
     cur.close()
@@ -49,33 +102,22 @@ def search_modules_by_name(search_term):
     Returns:
         list: List of module dictionaries with courses and lecturers
     """
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
     # If search term is '*', return all modules
     if search_term == '*':
-        cur.execute("SELECT * FROM modules ORDER BY code")
+        cur.execute(queries.ALL_MODULES)
         modules = cur.fetchall()
     else:
         # Use ILIKE for case-insensitive pattern matching
         # Search across module name, code, and lecturer names
         search_pattern = f"%{search_term}%"
-        cur.execute("""
-            SELECT DISTINCT m.*
-            FROM modules m
-            LEFT JOIN module_iterations mi ON m.id = mi.module_id
-            LEFT JOIN module_iterations_lecturers_links mil ON mi.id = mil.module_iteration_id
-            LEFT JOIN lecturers l ON mil.lecturer_id = l.id
-            WHERE
-              m.name ILIKE %s OR
-              m.code ILIKE %s OR
-              l.name ILIKE %s
-            ORDER BY m.code
-        """, (search_pattern, search_pattern, search_pattern))
+        cur.execute(queries.SEARCH_MODULES, (search_pattern, search_pattern, search_pattern))
         modules = cur.fetchall()
 
     # Get the most recent year from module_iterations
-    cur.execute("SELECT MAX(academic_year_start_year) FROM module_iterations")
+    cur.execute(queries.CURRENT_YEAR)
     result = cur.fetchone()
     current_year = result['max'] if result and result['max'] else None
 
@@ -84,29 +126,16 @@ def search_modules_by_name(search_term):
     for module in modules:
         if current_year:
             # Get current year iteration
-            cur.execute(
-                "SELECT id FROM module_iterations WHERE module_id = %s AND academic_year_start_year = %s",
-                (module['id'], current_year)
-            )
+            cur.execute(queries.ITERATION_FOR_YEAR, (module['id'], current_year))
             iteration = cur.fetchone()
 
             if iteration:
                 # Get courses for this iteration
-                cur.execute("""
-                    SELECT c.id, c.title
-                    FROM courses c
-                    INNER JOIN module_iterations_courses_links micl ON c.id = micl.course_id
-                    WHERE micl.module_iteration_id = %s
-                """, (iteration['id'],))
+                cur.execute(queries.ITERATION_COURSES, (iteration['id'],))
                 courses = cur.fetchall()
 
                 # Get lecturers for this iteration
-                cur.execute("""
-                    SELECT l.id, l.name
-                    FROM lecturers l
-                    INNER JOIN module_iterations_lecturers_links mil ON l.id = mil.lecturer_id
-                    WHERE mil.module_iteration_id = %s
-                """, (iteration['id'],))
+                cur.execute(queries.ITERATION_LECTURERS, (iteration['id'],))
                 lecturers = cur.fetchall()
 
                 enriched_module = dict(module)
@@ -130,6 +159,36 @@ def search_modules_by_name(search_term):
     return enriched_modules
 
 
+def iter_all_modules(batch_size=None):
+    """
+    Stream every module with its current year courses and lecturers.
+
+    Produces the same rows as ``search_modules_by_name('*')``, but enriches them
+    in a single query instead of three queries per module, and reads them in
+    batches from a server-side cursor.
+
+    Args:
+        batch_size (int): Rows fetched per round trip
+
+    Yields:
+        dict: Module dictionary with current_courses and current_lecturers
+    """
+    return stream_query(queries.ALL_MODULES_ENRICHED, batch_size=batch_size)
+
+
+def iter_all_courses(batch_size=None):
+    """
+    Stream all courses from a server-side cursor.
+
+    Args:
+        batch_size (int): Rows fetched per round trip
+
+    Yields:
+        dict: Course dictionary
+    """
+    return stream_query(queries.ALL_COURSES, batch_size=batch_size)
+
+
 def get_all_courses():
     """
     Get all courses.
@@ -137,10 +196,10 @@ def get_all_courses():
     Returns:
         list: List of all course dictionaries
     """
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    cur.execute("SELECT * FROM courses ORDER BY title")
+    cur.execute(queries.ALL_COURSES)
     courses = cur.fetchall()
 
     cur.close()
@@ -149,6 +208,81 @@ def get_all_courses():
     return courses
 
 
+def course_modules_page(course_id, year, page, page_size, rows):
+    """Shape one page of COURSE_MODULES rows into the /api/courses/<course_id>/modules response."""
+    total = rows[0]['total'] if rows else (0 if page == 1 else None)
+    modules = [{key: value for key, value in row.items() if key != 'total'} for row in rows]
+    return {
+        "course_id": int(course_id),
+        "year": year,
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "modules": modules,
+    }
+
+
+def get_course_modules(course_id, year=None, page=1, page_size=50):
+    """
+    Get one page of the modules offered on a course in an academic year.
+
+    Each module comes with its lecturers for that year and the count and
+    average rating of its published reviews.
+
+    Args:
+        course_id (int): The course ID
+        year (str): Academic start year; defaults to the course's latest year
+        page (int): 1-based page number
+        page_size (int): Modules per page
+
+    Returns:
+        dict: Page of modules with paging information, or None if course not found
+    """
+    conn = get_db_connection(readonly=True)
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+
+    cur.execute(queries.COURSE_BY_ID, (course_id,))
+    course = cur.fetchone()
+    result = None
+    if course:
+        if year is None:
+            cur.execute(queries.LATEST_COURSE_YEAR, (course_id,))
+            year = cur.fetchone()['year']
+        cur.execute(queries.COURSE_MODULES, {
+            "course_id": course_id,
+            "year": year,
+            "limit": page_size,
+            "offset": (page - 1) * page_size,
+        })
+        result = course_modules_page(course_id, year, page, page_size, cur.fetchall())
+
+    cur.close()
+    conn.close()
+
+    return result
+
+
+def refresh_course_modules(conn=None):
+    """
+    Rebuild the course_module_iterations view after importing catalogue data.
+
+    Readers keep using the previous contents until the refresh commits.
+
+    Args:
+        conn: Connection to refresh on; by default a new primary connection
+    """
+    own_conn = conn is None
+    conn = conn or get_db_connection()
+    cur = conn.cursor()
+
+    cur.execute(queries.REFRESH_COURSE_MODULES)
+    conn.commit()
+
+    cur.close()
+    if own_conn:
+        conn.close()
+
+
 def get_module_by_id(module_id):
     """
     Get a module by its ID.
@@ -159,10 +293,10 @@ def get_module_by_id(module_id):
     Returns:
         dict: Module data or None if not found
     """
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    cur.execute("SELECT * FROM modules WHERE id = %s", (module_id,))
+    cur.execute(queries.MODULE_BY_ID, (module_id,))
     module = cur.fetchone()
 
     cur.close()
@@ -181,10 +315,10 @@ def get_module_iterations(module_id):
     Returns:
         list: List of module iteration dictionaries
     """
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    cur.execute("SELECT * FROM module_iterations WHERE module_id = %s", (module_id,))
+    cur.execute(queries.MODULE_ITERATIONS, (module_id,))
     iterations = cur.fetchall()
 
     cur.close()
@@ -203,10 +337,10 @@ def get_lecturers_for_iteration(module_iteration_id):
     Returns:
         list: List of lecturer dictionaries
     """
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    cur.execute("SELECT * FROM lecturers_from_module_iteration(%s)", (module_iteration_id,))
+    cur.execute(queries.LECTURERS_FOR_ITERATION, (module_iteration_id,))
     lecturers = cur.fetchall()
 
     cur.close()
@@ -225,10 +359,10 @@ def get_courses_for_iteration(module_iteration_id):
     Returns:
         list: List of course dictionaries
     """
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    cur.execute("SELECT * FROM courses_from_module_iteration(%s)", (module_iteration_id,))
+    cur.execute(queries.COURSES_FOR_ITERATION, (module_iteration_id,))
     courses = cur.fetchall()
 
     cur.close()
@@ -247,13 +381,10 @@ def get_published_reviews_for_iteration(module_iteration_id):
     Returns:
         list: List of review dictionaries
     """
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    cur.execute(
-        "SELECT * FROM reviews WHERE module_iteration_id = %s AND moderation_status = %s",
-        (module_iteration_id, 'published')
-    )
+    cur.execute(queries.PUBLISHED_REVIEWS_FOR_ITERATION, (module_iteration_id, 'published'))
     reviews = cur.fetchall()
 
     cur.close()
@@ -297,6 +428,33 @@ def get_module_info_with_iterations(module_id):
 
     return years_info
 
+
+def get_related_modules(module_id, limit=10):
+    """
+    Get the modules most similar to a module, as precomputed by related.py.
+
+    Args:
+        module_id (int): The module ID
+        limit (int): Maximum number of related modules to return
+
+    Returns:
+        list: Related modules with similarity scores, best first, or None if module not found
+    """
+    conn = get_db_connection(readonly=True)
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+
+    cur.execute(queries.MODULE_BY_ID, (module_id,))
+    module = cur.fetchone()
+    related = None
+    if module:
+        cur.execute(queries.RELATED_MODULES, (module_id, limit))
+        related = cur.fetchall()
+
+    cur.close()
+    conn.close()
+
+    return related
+
 def like_or_dislike_review(review_id, like_or_dislike=True):
     """
     Increment or decrement the like count for a review.
@@ -312,15 +470,9 @@ def like_or_dislike_review(review_id, like_or_dislike=True):
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
     if like_or_dislike:
-        cur.execute(
-            "UPDATE reviews SET like_dislike = like_dislike + 1 WHERE id = %s RETURNING like_dislike",
-            (review_id,)
-        )
+        cur.execute(queries.LIKE_REVIEW, (review_id,))
     else:
-        cur.execute(
-            "UPDATE reviews SET like_dislike = like_dislike - 1 WHERE id = %s RETURNING like_dislike",
-            (review_id,)
-        )
+        cur.execute(queries.DISLIKE_REVIEW, (review_id,))
 
     result = cur.fetchone()
 
@@ -333,7 +485,8 @@ def like_or_dislike_review(review_id, like_or_dislike=True):
 def report_review(review_id):
     """
     Report a review by setting its moderation status to 'reported'.
-    This will notify admins for review.
+    Once reported, an admin notification is queued in the outbox in the same
+    transaction; notifications.py delivers it.
 
     Args:
         review_id (int): The review ID
@@ -344,25 +497,15 @@ def report_review(review_id):
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    cur.execute(
-        "UPDATE reviews SET report_count = report_count + 1 WHERE id = %s",
-        (review_id)
-    )
+    cur.execute(queries.INCREMENT_REPORT_COUNT, (review_id,))
 
-    cur.execute(
-        "SELECT report_count, report_tolerance FROM reviews WHERE id = %s",
-        (review_id)
-    )
+    cur.execute(queries.REPORT_COUNTS, (review_id,))
 
     result = cur.fetchone()
 
     if result['report_count'] >= result['report_tolerance']:
-        cur.execute(
-            "UPDATE reviews SET moderation_status = %s WHERE id = %s",
-            ('reported', review_id)
-        )
-
-        notify_admins_of_reported_review(review_id)
+        cur.execute(queries.SET_MODERATION_STATUS, ('reported', review_id))
+        cur.execute(queries.ENQUEUE_NOTIFICATION, ('reported_review', json.dumps({"review_id": int(review_id)})))
 
     conn.commit()
     cur.close()
@@ -387,7 +530,7 @@ def submit_review(module_iteration_id, text, rating, reasonable):
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
     cur.execute(
-        "INSERT INTO reviews (module_iteration_id, overall_rating, comment, moderation_status, like_dislike) VALUES (%s, %s, %s, %s, 0)",
+        queries.INSERT_REVIEW,
         (module_iteration_id, rating, text, 'published' if reasonable else 'automatic_review')
     )
 
@@ -405,21 +548,10 @@ def get_pending_reviews():
     Returns:
         list: List of review dictionaries with module info
     """
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    cur.execute("""
-        SELECT
-            r.*,
-            m.code as module_code,
-            m.name as module_name,
-            mi.academic_year_start_year
-        FROM reviews r
-        INNER JOIN module_iterations mi ON r.module_iteration_id = mi.id
-        INNER JOIN modules m ON mi.module_id = m.id
-        WHERE r.moderation_status != 'published' AND r.moderation_status != 'rejected'
-        ORDER BY r.created_at DESC
-    """)
+    cur.execute(queries.PENDING_REVIEWS)
     reviews = cur.fetchall()
 
     cur.close()
@@ -428,6 +560,19 @@ def get_pending_reviews():
     return reviews
 
 
+def iter_pending_reviews(batch_size=None):
+    """
+    Stream all reviews that need moderation from a server-side cursor.
+
+    Args:
+        batch_size (int): Rows fetched per round trip
+
+    Yields:
+        dict: Review dictionary with module info
+    """
+    return stream_query(queries.PENDING_REVIEWS, batch_size=batch_size)
+
+
 def get_rejected_reviews():
     """
     Get all rejected reviews.
@@ -435,21 +580,10 @@ def get_rejected_reviews():
     Returns:
         list: List of rejected review dictionaries with module info
     """
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    cur.execute("""
-        SELECT
-            r.*,
-            m.code as module_code,
-            m.name as module_name,
-            mi.academic_year_start_year
-        FROM reviews r
-        INNER JOIN module_iterations mi ON r.module_iteration_id = mi.id
-        INNER JOIN modules m ON mi.module_id = m.id
-        WHERE r.moderation_status = 'rejected'
-        ORDER BY r.created_at DESC
-    """)
+    cur.execute(queries.REJECTED_REVIEWS)
     reviews = cur.fetchall()
 
     cur.close()
@@ -471,10 +605,7 @@ def accept_review(review_id):
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    cur.execute(
-        "UPDATE reviews SET moderation_status = 'published', report_tolerance = report_tolerance + 2 WHERE id = %s",
-        (review_id,)
-    )
+    cur.execute(queries.ACCEPT_REVIEW, (review_id,))
 
     conn.commit()
     cur.close()
@@ -496,13 +627,118 @@ def reject_review(review_id):
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    cur.execute(
-        "UPDATE reviews SET moderation_status = 'rejected' WHERE id = %s",
-        (review_id,)
-    )
+    cur.execute(queries.REJECT_REVIEW, (review_id,))
 
     conn.commit()
     cur.close()
     conn.close()
 
     return True
+
+
+def bulk_moderation_params(review_ids=None, module_id=None, older_than_days=None, min_report_count=None):
+    """
+    Validate bulk moderation criteria and build the query parameters.
+
+    Raises:
+        ValueError: If no criteria are given, review_ids is not a list or a value is not an integer
+    """
+    if review_ids is None and module_id is None and older_than_days is None and min_report_count is None:
+        raise ValueError("At least one of review_ids, module_id, older_than_days or min_report_count is required")
+
+    if review_ids is not None:
+        # A string would otherwise be read one digit at a time ("123" -> 1, 2, 3)
+        if not isinstance(review_ids, (list, tuple)):
+            raise ValueError("review_ids must be a list of review IDs")
+        # De-duplicate while keeping the caller's order for the results
+        review_ids = list(dict.fromkeys(int(review_id) for review_id in review_ids))
+
+    return {
+        "review_ids": review_ids,
+        "module_id": int(module_id) if module_id is not None else None,
+        "older_than_days": int(older_than_days) if older_than_days is not None else None,
+        "min_report_count": int(min_report_count) if min_report_count is not None else None,
+    }
+
+
+def bulk_moderation_results(outcome, review_ids, updated, existing):
+    """
+    Build the per-id results of a bulk moderation.
+
+    Requested ids are reported as ``outcome``, 'not_pending' (exists but is not in
+    the moderation queue or did not match the other filters) or 'not_found'.
+    Without an id list, every updated review is reported.
+    """
+    if review_ids is None:
+        return [{"id": review_id, "result": outcome} for review_id in sorted(updated)]
+
+    results = []
+    for review_id in review_ids:
+        if review_id in updated:
+            result = outcome
+        elif review_id in existing:
+            result = "not_pending"
+        else:
+            result = "not_found"
+        results.append({"id": review_id, "result": result})
+    return results
+
+
+def _moderate_reviews(query, outcome, review_ids, module_id, older_than_days, min_report_count):
+    params = bulk_moderation_params(review_ids, module_id, older_than_days, min_report_count)
+
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+
+    cur.execute(query, params)
+    updated = {row['id'] for row in cur.fetchall()}
+
+    existing = set()
+    missing = [review_id for review_id in params['review_ids'] or [] if review_id not in updated]
+    if missing:
+        cur.execute(queries.EXISTING_REVIEW_IDS, (missing,))
+        existing = {row['id'] for row in cur.fetchall()}
+
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    return {
+        "updated": len(updated),
+        "results": bulk_moderation_results(outcome, params['review_ids'], updated, existing)
+    }
+
+
+def accept_reviews(review_ids=None, module_id=None, older_than_days=None, min_report_count=None):
+    """
+    Accept every pending review matching the given criteria in one transaction.
+
+    Like accept_review, each accepted review is published and its report
+    tolerance increased by 2. Criteria are combined with AND.
+
+    Args:
+        review_ids (list): Review IDs to accept
+        module_id (int): Only reviews of this module
+        older_than_days (int): Only reviews created more than this many days ago
+        min_report_count (int): Only reviews reported at least this many times
+
+    Returns:
+        dict: Number of updated reviews and a list of per-id results
+    """
+    return _moderate_reviews(queries.BULK_ACCEPT_REVIEWS, 'accepted', review_ids, module_id, older_than_days, min_report_count)
+
+
+def reject_reviews(review_ids=None, module_id=None, older_than_days=None, min_report_count=None):
+    """
+    Reject every pending review matching the given criteria in one transaction.
+
+    Args:
+        review_ids (list): Review IDs to reject
+        module_id (int): Only reviews of this module
+        older_than_days (int): Only reviews created more than this many days ago
+        min_report_count (int): Only reviews reported at least this many times
+
+    Returns:
+        dict: Number of updated reviews and a list of per-id results
+    """
+    return _moderate_reviews(queries.BULK_REJECT_REVIEWS, 'rejected', review_ids, module_id, older_than_days, min_report_count)
@@ -0,0 +1,377 @@
+"""Bulk export of reviews with their module, year and course context.
+
+Every review is joined with its module iteration, module and the courses the
+iteration is offered on, and written as NDJSON, CSV or Parquet:
+
+- ``ndjson`` and ``csv`` stream the output of ``COPY ... TO STDOUT`` straight
+  from Postgres, batch_size rows at a time.
+- ``parquet`` reads batch_size rows at a time from a server-side cursor and
+  writes each batch as a row group (requires pyarrow).
+
+Memory use is bounded by batch_size whatever the size of the export. An
+export covers reviews created in (since, until]; ``until`` defaults to
+EXPORT_WATERMARK_LAG_SECONDS before the last commit the database has applied,
+so reviews still being inserted are left for the next run, and is returned as
+the watermark to pass as ``since`` next time. Exports read from a replica,
+where that is the last replayed commit rather than the clock, so a lagging
+replica never moves the watermark past reviews it has not received yet:
+
+    python export.py --format parquet --output reviews.parquet
+    python export.py --format ndjson --state-file export.state --output new_reviews.ndjson
+
+The same export is served to admins at /api/admin/exportReviews.
+"""
+
+import argparse
+import datetime
+import os
+import queue
+import sys
+import threading
+from pathlib import Path
+
+from db import get_db_connection
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "10000"))
+EXPORT_WATERMARK_LAG_SECONDS = int(os.getenv("EXPORT_WATERMARK_LAG_SECONDS", "60"))
+# Batches buffered between the COPY reader and the consumer
+EXPORT_QUEUE_BATCHES = 2
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# NULL on a replica that has not replayed any commits yet
+EXPORT_WATERMARK = """
+    SELECT (
+        CASE WHEN pg_is_in_recovery() THEN pg_last_xact_replay_timestamp() ELSE NOW() END
+        - make_interval(secs => %s)
+    )::timestamp AS until
+"""
+
+# Reviews in (since, until] with module, year and course context. Courses are
+# aggregated once per iteration rather than once per review.
+EXPORT_REVIEWS = """
+    WITH iteration_courses AS (
+        SELECT
+            module_iteration_id,
+            array_agg(course_id ORDER BY course_id) AS course_ids,
+            array_agg(title ORDER BY course_id) AS course_titles
+        FROM (
+            SELECT DISTINCT micl.module_iteration_id, c.id AS course_id, c.title
+            FROM module_iterations_courses_links micl
+            INNER JOIN courses c ON c.id = micl.course_id
+        ) links
+        GROUP BY module_iteration_id
+    )
+    SELECT
+        r.id AS review_id,
+        r.created_at,
+        r.overall_rating,
+        r.comment,
+        r.moderation_status,
+        r.like_dislike,
+        r.report_count,
+        mi.id AS module_iteration_id,
+        mi.academic_year_start_year,
+        m.id AS module_id,
+        m.code AS module_code,
+        m.name AS module_name,
+        m.credits,
+        m.department_id,
+        COALESCE(ic.course_ids, '{}') AS course_ids,
+        COALESCE(ic.course_titles, '{}') AS course_titles
+    FROM reviews r
+    INNER JOIN module_iterations mi ON mi.id = r.module_iteration_id
+    INNER JOIN modules m ON m.id = mi.module_id
+    LEFT JOIN iteration_courses ic ON ic.module_iteration_id = mi.id
+    WHERE (%(since)s::timestamp IS NULL OR r.created_at > %(since)s::timestamp)
+      AND r.created_at <= %(until)s::timestamp
+      AND (%(status)s::text IS NULL OR r.moderation_status = %(status)s::text)
+"""
+
+# One JSON document per line. CSV mode with quote and delimiter characters that
+# row_to_json always escapes, so the JSON is written out unaltered.
+COPY_NDJSON = "COPY (SELECT row_to_json(e) FROM ({query}) e) TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+
+COPY_CSV = """
+    COPY (
+        SELECT
+            review_id, created_at, overall_rating, comment, moderation_status, like_dislike, report_count,
+            module_iteration_id, academic_year_start_year, module_id, module_code, module_name, credits,
+            department_id, array_to_json(course_ids) AS course_ids, array_to_json(course_titles) AS course_titles
+        FROM ({query}) e
+    ) TO STDOUT WITH (FORMAT csv, HEADER)
+"""
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("review_id", pa.int32()),
+        ("created_at", pa.timestamp("us")),
+        ("overall_rating", pa.int32()),
+        ("comment", pa.string()),
+        ("moderation_status", pa.string()),
+        ("like_dislike", pa.int32()),
+        ("report_count", pa.int32()),
+        ("module_iteration_id", pa.int32()),
+        ("academic_year_start_year", pa.string()),
+        ("module_id", pa.int32()),
+        ("module_code", pa.string()),
+        ("module_name", pa.string()),
+        ("credits", pa.int32()),
+        ("department_id", pa.int32()),
+        ("course_ids", pa.list_(pa.int32())),
+        ("course_titles", pa.list_(pa.string())),
+    ])
+
+
+def format_watermark(until):
+    """Render a watermark timestamp as text that Postgres parses back to the same value."""
+    return until.isoformat(sep=" ") if isinstance(until, datetime.datetime) else str(until)
+
+
+class _Cancelled(Exception):
+    pass
+
+
+_DONE = object()
+
+
+def _put(chunks, item, cancelled):
+    while True:
+        try:
+            chunks.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            if cancelled.is_set():
+                raise _Cancelled()
+
+
+class _BatchWriter:
+    """File-like target for copy_expert that queues every batch_size rows as one chunk."""
+
+    def __init__(self, batch_size, chunks, cancelled):
+        self.batch_size = batch_size
+        self.rows = 0
+        self._chunks = chunks
+        self._cancelled = cancelled
+        self._buffer = []
+
+    def write(self, data):
+        # copy_expert writes one row per call
+        self._buffer.append(data)
+        self.rows += 1
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            _put(self._chunks, b"".join(self._buffer), self._cancelled)
+            self._buffer = []
+
+
+class _ByteSink:
+    """Write-only file for ParquetWriter whose contents are handed out as they are written."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _copy_chunks(conn, copy_sql, batch_size, stats, header_rows=0):
+    """Run COPY ... TO STDOUT on a background thread and yield its output batch by batch."""
+    chunks = queue.Queue(maxsize=EXPORT_QUEUE_BATCHES)
+    cancelled = threading.Event()
+    writer = _BatchWriter(batch_size, chunks, cancelled)
+
+    def run():
+        cur = conn.cursor()
+        try:
+            cur.copy_expert(copy_sql, writer)
+            writer.flush()
+            _put(chunks, _DONE, cancelled)
+        except _Cancelled:
+            pass
+        except Exception as e:
+            try:
+                _put(chunks, e, cancelled)
+            except _Cancelled:
+                pass
+
+    thread = threading.Thread(target=run, name="export-copy", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            stats["bytes"] += len(item)
+            stats["rows"] = writer.rows - header_rows
+            yield item
+    finally:
+        cancelled.set()
+        thread.join()
+        conn.close()
+
+
+def _parquet_chunks(conn, params, batch_size, stats):
+    """Write the export as Parquet, one row group per batch_size rows, yielding bytes as they are produced."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = _ByteSink()
+    cur = conn.cursor(name="export_reviews")
+    cur.itersize = batch_size
+    try:
+        cur.execute(EXPORT_REVIEWS, params)
+        with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                columns = zip(*rows)
+                writer.write_batch(pa.RecordBatch.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+                ))
+                stats["rows"] += len(rows)
+                data = sink.take()
+                stats["bytes"] += len(data)
+                yield data
+        data = sink.take()
+        stats["bytes"] += len(data)
+        yield data
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _prepend(first, chunks):
+    # A generator rather than itertools.chain, so closing it (e.g. when the client
+    # disconnects) also closes the export and releases its connection
+    if first is not None:
+        yield first
+    yield from chunks
+
+
+def export_reviews(export_format="ndjson", since=None, until=None, status=None, batch_size=None):
+    """
+    Start an export of reviews with their module, year and course context.
+
+    The query is started and its first batch read before returning, so
+    connection and query errors are raised here rather than mid-stream.
+
+    Args:
+        export_format (str): "ndjson", "csv" or "parquet"
+        since (str or datetime): Only reviews created after this watermark
+        until (str or datetime): Only reviews created at or before this; defaults to the last applied
+            commit minus the watermark lag
+        status (str): Only reviews with this moderation status
+        batch_size (int): Rows per chunk (defaults to EXPORT_BATCH_SIZE)
+
+    Returns:
+        dict: "chunks" (iterator of bytes), "watermark" (pass as since next time), "content_type",
+            "extension" and "stats" (rows and bytes written so far)
+    """
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+
+    conn = get_db_connection(readonly=True)
+    try:
+        cur = conn.cursor()
+        if until is None:
+            cur.execute(EXPORT_WATERMARK, (EXPORT_WATERMARK_LAG_SECONDS,))
+            until = cur.fetchone()[0]
+            if until is None:
+                raise RuntimeError("The export replica has not replayed any commits yet")
+        params = {"since": since, "until": until, "status": status}
+
+        query = cur.mogrify(EXPORT_REVIEWS, params).decode()
+        cur.close()
+
+        stats = {"rows": 0, "bytes": 0}
+        if export_format == "parquet":
+            chunks = _parquet_chunks(conn, params, batch_size, stats)
+        else:
+            template = COPY_CSV if export_format == "csv" else COPY_NDJSON
+            header_rows = 1 if export_format == "csv" else 0
+            chunks = _copy_chunks(conn, template.format(query=query), batch_size, stats, header_rows)
+        first = next(chunks, None)
+    except Exception:
+        conn.close()
+        raise
+
+    content_type, extension = FORMATS[export_format]
+    return {
+        "chunks": _prepend(first, chunks),
+        "watermark": format_watermark(until),
+        "content_type": content_type,
+        "extension": extension,
+        "stats": stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+    parser.add_argument("--output", help="File to write (default: stdout)")
+    parser.add_argument("--since", help="Only reviews created after this timestamp")
+    parser.add_argument("--until", help="Only reviews created at or before this timestamp")
+    parser.add_argument("--state-file", help="Read --since from and write the new watermark to this file")
+    parser.add_argument("--status", help="Only reviews with this moderation status, e.g. published")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    since = args.since
+    state_file = Path(args.state_file) if args.state_file else None
+    if since is None and state_file and state_file.exists():
+        since = state_file.read_text().strip() or None
+
+    export = export_reviews(args.format, since, args.until, args.status, args.batch_size)
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in export["chunks"]:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+        else:
+            output.flush()
+
+    watermark = export["watermark"]
+    if state_file:
+        state_file.write_text(watermark + "\n")
+    print(f"Exported {export['stats']['rows']} reviews ({export['stats']['bytes']} bytes) "
+          f"created after {since or 'the beginning'} up to {watermark}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
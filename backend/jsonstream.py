@@ -0,0 +1,57 @@
+"""Incremental encoding of {"<key>": [...]} documents for streamed responses.
+
+Used by app.py and async_app.py to write large lists to the client
+STREAM_CHUNK_ROWS rows at a time instead of building the whole body in memory.
+"""
+
+import json
+import os
+
+# Number of rows serialised per chunk written to the client by streamed responses
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "200"))
+
+
+class JsonListEncoder:
+    """
+    Encode rows into chunks of a {"<key>": [...]} document.
+
+    Call start(), then add() for each row (it returns a chunk every chunk_rows
+    rows, otherwise None), then finish(). Chunks after the first begin with
+    the separator, so the document is valid wherever the rows run out.
+    """
+
+    def __init__(self, key, dumps=json.dumps, chunk_rows=None):
+        self.key = key
+        self.dumps = dumps
+        self.chunk_rows = chunk_rows or STREAM_CHUNK_ROWS
+        self._rows = []
+        self._sent = False
+
+    def start(self):
+        return '{%s: [' % json.dumps(self.key)
+
+    def add(self, row):
+        self._rows.append(self.dumps(row))
+        if len(self._rows) >= self.chunk_rows:
+            return self._flush()
+        return None
+
+    def finish(self):
+        return (self._flush() if self._rows else "") + "]}"
+
+    def _flush(self):
+        chunk = ("," if self._sent else "") + ",".join(self._rows)
+        self._rows = []
+        self._sent = True
+        return chunk
+
+
+def iter_json_list(key, rows, dumps=json.dumps, chunk_rows=None):
+    """Yield the chunks of {"<key>": [...]} for a row iterator."""
+    encoder = JsonListEncoder(key, dumps, chunk_rows)
+    yield encoder.start()
+    for row in rows:
+        chunk = encoder.add(row)
+        if chunk is not None:
+            yield chunk
+    yield encoder.finish()
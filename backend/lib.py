@@ -1,12 +1,47 @@
-import google.generativeai as genai
+"""Gemini sentiment checks and programme specification parsing.
+
+The Gemini SDK and pdfplumber are slow to import and only needed by the
+submission and import paths, so they are imported on first use. Prompts are
+read from files next to this module when it is imported, so they are loaded
+once in a pre-forking server's parent process and do not depend on the
+working directory.
+"""
+
 from enum import Enum
+from pathlib import Path
 import os
+import threading
+
+from metrics import time_llm_call
 
 MODEL_ID = "gemini-2.5-flash-lite"
 
-f = open("sentiment_analysis_prompt.txt", "r")
-master_prompt = f.read()
-f.close()
+PROMPTS_DIR = Path(__file__).resolve().parent
+
+
+def load_prompt(name):
+    """Read a prompt file that ships alongside this module."""
+    return (PROMPTS_DIR / name).read_text(encoding="utf-8")
+
+
+master_prompt = load_prompt("sentiment_analysis_prompt.txt")
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """Return the Gemini model, importing and configuring the SDK on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
+                _model = genai.GenerativeModel(MODEL_ID)
+    return _model
+
 
 def sentiment_review(text):
     full_prompt = master_prompt + text
@@ -21,23 +56,40 @@ def sentiment_review(text):
     raise Exception("Gen AI not raising binary answers.")
 
 def query(prompt):
-    genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
-    model = genai.GenerativeModel(MODEL_ID)
-    response = model.generate_content(prompt)
+    model = get_model()
+    with time_llm_call():
+        response = model.generate_content(prompt)
+    return response.text
+
+async def async_sentiment_review(text):
+    full_prompt = master_prompt + text
+    count = 0
+    while count < 3:
+        response = await async_query(full_prompt)
+        if response == "Yes":
+            return True
+        elif response == "No":
+            return False
+        count += 1
+    raise Exception("Gen AI not raising binary answers.")
+
+async def async_query(prompt):
+    model = get_model()
+    with time_llm_call():
+        response = await model.generate_content_async(prompt)
     return response.text
 
 
-def notify_admins_of_reported_review(review_id):
+def notify_admins_of_reported_reviews(review_ids):
     """
-    Skeleton function to notify admins of a reported review.
+    Log a digest of reported reviews for admins.
+
+    Used by the "log" notification channel in notifications.py.
 
     Args:
-        review_id (int): The review ID
+        review_ids (list): The reported review IDs
     """
-    # TODO: Implement admin notification system
-    # This could send emails, create notifications in admin panel, etc.
-    print(f"ADMIN NOTIFICATION: Review {review_id} has been reported and requires moderation")
-    pass
+    print(f"ADMIN NOTIFICATION: {len(review_ids)} review(s) reported and requiring moderation: {review_ids}")
 
 def programme_specification_pdf_parser(file_path):
     """
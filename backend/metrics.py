@@ -0,0 +1,301 @@
+"""Request-level performance instrumentation for module_guide.
+
+Tracks, per request: route, total latency, DB connections opened, queries run,
+time spent in SQL and time spent in LLM calls. Totals are kept in an
+in-process registry and rendered in Prometheus text format by
+``render_prometheus`` (served at /api/metrics). Each worker process keeps its
+own registry. ``init_app`` instruments the Flask app and psycopg2
+connections; ``init_async_app`` and the Timed*Cursor classes in async_db do
+the same for the Quart app and its psycopg 3 pool.
+
+Queries slower than SLOW_QUERY_MS are logged with their parameters redacted.
+When METRICS_DEBUG_HEADERS is set (or the app runs in debug mode) responses
+also carry ``X-Query-Count`` and ``Server-Timing`` headers.
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2.extensions
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+METRICS_DEBUG_HEADERS = os.getenv("METRICS_DEBUG_HEADERS", "").lower() in ("1", "true", "yes")
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_query_logger = logging.getLogger("module_guide.slow_queries")
+
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    """Counters for the request currently being served."""
+
+    __slots__ = ("start", "connections", "queries", "sql_seconds", "llm_calls", "llm_seconds")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.connections = 0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+
+
+class Registry:
+    """Thread-safe store of counters and histograms, rendered in Prometheus format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._types = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def describe(self, name, metric_type, help_text):
+        self._types[name] = metric_type
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def value(self, name, **labels):
+        """Return the current value of a counter (0 if never incremented)."""
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()}
+
+        lines = []
+        names = sorted({name for name, _ in counters} | {name for name, _ in histograms})
+        for name in names:
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {self._types[name]}")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {bucket_count}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+registry = Registry()
+registry.describe("module_guide_requests_total", "counter", "HTTP requests served.")
+registry.describe("module_guide_request_duration_seconds", "histogram", "HTTP request latency.")
+registry.describe("module_guide_db_connections_total", "counter", "Database connections opened.")
+registry.describe("module_guide_db_queries_total", "counter", "SQL statements executed.")
+registry.describe("module_guide_db_query_seconds_total", "counter", "Time spent executing SQL.")
+registry.describe("module_guide_llm_calls_total", "counter", "LLM calls made through lib.query.")
+registry.describe("module_guide_llm_seconds_total", "counter", "Time spent waiting on LLM calls.")
+registry.describe("module_guide_slow_queries_total", "counter", "SQL statements slower than SLOW_QUERY_MS.")
+
+
+def render_prometheus():
+    """Render all metrics in Prometheus text exposition format."""
+    return registry.render()
+
+
+def record_connection():
+    """Record that a database connection was opened."""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.connections += 1
+
+
+def record_query(query, params, seconds):
+    """Record one executed SQL statement and log it if it was slow."""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.sql_seconds += seconds
+
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        registry.inc("module_guide_slow_queries_total")
+        if isinstance(query, bytes):
+            query = query.decode(errors="replace")
+        slow_query_logger.warning(
+            "slow query (%.1f ms, %d params redacted): %s",
+            seconds * 1000, len(params) if params else 0, " ".join(str(query).split())
+        )
+
+
+@contextmanager
+def collect():
+    """Collect RequestStats for the enclosed block, outside of a Flask request."""
+    stats = RequestStats()
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+
+
+@contextmanager
+def time_llm_call():
+    """Time an LLM call and attribute it to the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.llm_calls += 1
+            stats.llm_seconds += time.perf_counter() - start
+
+
+class TimedCursorMixin:
+    """Cursor mixin that reports every execute() to record_query."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_query(query, vars, time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record_query(query, None, time.perf_counter() - start)
+
+
+class TimedAsyncCursorMixin:
+    """psycopg 3 async cursor mixin that reports every execute() to record_query."""
+
+    async def execute(self, query, params=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            record_query(query, params, time.perf_counter() - start)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().executemany(query, params_seq, **kwargs)
+        finally:
+            record_query(query, None, time.perf_counter() - start)
+
+
+_timed_cursor_classes = {}
+
+
+def _timed_cursor_class(cursor_factory):
+    timed = _timed_cursor_classes.get(cursor_factory)
+    if timed is None:
+        timed = type("Timed" + cursor_factory.__name__, (TimedCursorMixin, cursor_factory), {})
+        _timed_cursor_classes[cursor_factory] = timed
+    return timed
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    """psycopg2 connection whose cursors are timed, whatever cursor_factory is asked for."""
+
+    def cursor(self, *args, **kwargs):
+        cursor_factory = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _timed_cursor_class(cursor_factory)
+        return super().cursor(*args, **kwargs)
+
+
+def finish_request(request, response, debug):
+    """Record the current request's stats and, in debug mode, add them as response headers."""
+    stats = _request_stats.get()
+    if stats is None:
+        return response
+
+    elapsed = time.perf_counter() - stats.start
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+
+    registry.inc("module_guide_requests_total", route=route, method=request.method, status=response.status_code)
+    registry.observe("module_guide_request_duration_seconds", elapsed, route=route)
+    registry.inc("module_guide_db_connections_total", stats.connections, route=route)
+    registry.inc("module_guide_db_queries_total", stats.queries, route=route)
+    registry.inc("module_guide_db_query_seconds_total", stats.sql_seconds, route=route)
+    registry.inc("module_guide_llm_calls_total", stats.llm_calls, route=route)
+    registry.inc("module_guide_llm_seconds_total", stats.llm_seconds, route=route)
+
+    if debug:
+        response.headers["X-Query-Count"] = str(stats.queries)
+        response.headers["Server-Timing"] = ", ".join((
+            f'db;dur={stats.sql_seconds * 1000:.1f};desc="{stats.queries} queries, {stats.connections} connections"',
+            f'llm;dur={stats.llm_seconds * 1000:.1f};desc="{stats.llm_calls} calls"',
+            f"total;dur={elapsed * 1000:.1f}",
+        ))
+    return response
+
+
+def init_app(app):
+    """Register the per-request hooks and the /api/metrics endpoint on a Flask app."""
+
+    @app.before_request
+    def start_request_stats():
+        _request_stats.set(RequestStats())
+
+    @app.after_request
+    def finish_request_stats(response):
+        from flask import current_app, request
+
+        # app.debug is only final once the app is running (e.g. app.run(debug=True))
+        return finish_request(request, response, METRICS_DEBUG_HEADERS or current_app.debug)
+
+    @app.route("/api/metrics")
+    def metrics_route():
+        return app.response_class(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+def init_async_app(app):
+    """Register the per-request hooks and the /api/metrics endpoint on a Quart app."""
+
+    @app.before_request
+    async def start_request_stats():
+        _request_stats.set(RequestStats())
+
+    @app.after_request
+    async def finish_request_stats(response):
+        from quart import current_app, request
+
+        return finish_request(request, response, METRICS_DEBUG_HEADERS or current_app.debug)
+
+    @app.route("/api/metrics")
+    async def metrics_route():
+        return app.response_class(render_prometheus(), mimetype="text/plain; version=0.0.4")
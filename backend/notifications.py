@@ -0,0 +1,317 @@
+"""Admin notification dispatcher for the transactional outbox.
+
+db.report_review writes a row to ``notification_outbox`` in the same
+transaction that marks the review as reported, so reporting never waits on a
+mail server or webhook. This dispatcher wakes every DIGEST_WINDOW_SECONDS,
+claims the pending rows that are due, and sends one digest to each channel
+in NOTIFY_CHANNELS:
+
+- ``log``: print the digest (lib.notify_admins_of_reported_reviews)
+- ``smtp``: email ADMIN_EMAILS through SMTP_HOST:SMTP_PORT
+- ``webhook``: POST the digest as JSON to NOTIFY_WEBHOOK_URL
+
+Each row records the channels it has reached. If a channel fails, the rows
+are retried with exponential backoff, on the failed channels only, and marked
+'failed' after NOTIFY_MAX_ATTEMPTS. Several dispatchers can run at once:
+rows are claimed with FOR UPDATE SKIP LOCKED.
+
+    python notifications.py                      # run the dispatcher
+    python notifications.py --once               # send one round of digests and exit
+    python notifications.py stand-in --port 8026 # local webhook receiver for testing
+"""
+
+import argparse
+import json
+import logging
+import os
+import smtplib
+import threading
+import time
+import urllib.request
+from email.message import EmailMessage
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from psycopg2.extras import RealDictCursor
+
+import metrics
+from db import get_db_connection
+from lib import notify_admins_of_reported_reviews
+
+DIGEST_WINDOW_SECONDS = float(os.getenv("DIGEST_WINDOW_SECONDS", "300"))
+DIGEST_MAX_ITEMS = int(os.getenv("DIGEST_MAX_ITEMS", "500"))
+NOTIFY_CHANNELS = [channel.strip() for channel in os.getenv("NOTIFY_CHANNELS", "log").split(",") if channel.strip()]
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "8"))
+NOTIFY_RETRY_BASE_SECONDS = float(os.getenv("NOTIFY_RETRY_BASE_SECONDS", "30"))
+NOTIFY_RETRY_MAX_SECONDS = float(os.getenv("NOTIFY_RETRY_MAX_SECONDS", "3600"))
+ADMIN_EMAILS = [email.strip() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()]
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "1025"))
+SMTP_FROM = os.getenv("SMTP_FROM", "module-guide@localhost")
+NOTIFY_WEBHOOK_URL = os.getenv("NOTIFY_WEBHOOK_URL")
+
+logger = logging.getLogger("module_guide.notifications")
+
+metrics.registry.describe("module_guide_notification_digests_total", "counter", "Notification digests attempted, by channel and outcome.")
+metrics.registry.describe("module_guide_notifications_total", "counter", "Outbox notifications processed, by outcome.")
+metrics.registry.describe("module_guide_notification_delivery_seconds_total", "counter", "Time spent delivering digests, by channel.")
+
+CLAIM_DUE_NOTIFICATIONS = """
+    SELECT id, kind, payload, attempts, delivered_channels
+    FROM notification_outbox
+    WHERE status = 'pending' AND next_attempt_at <= NOW()
+    ORDER BY id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+REPORTED_REVIEW_DETAILS = """
+    SELECT
+        r.id,
+        r.comment,
+        r.report_count,
+        m.code as module_code,
+        m.name as module_name,
+        mi.academic_year_start_year
+    FROM reviews r
+    INNER JOIN module_iterations mi ON r.module_iteration_id = mi.id
+    INNER JOIN modules m ON mi.module_id = m.id
+    WHERE r.id = ANY(%s)
+    ORDER BY r.report_count DESC, r.id
+"""
+
+RECORD_DELIVERED_CHANNELS = """
+    UPDATE notification_outbox
+    SET delivered_channels = ARRAY(SELECT DISTINCT unnest(delivered_channels || %s::text[]) ORDER BY 1)
+    WHERE id = ANY(%s)
+"""
+
+MARK_SENT = "UPDATE notification_outbox SET status = 'sent', sent_at = NOW(), attempts = attempts + 1 WHERE id = ANY(%s)"
+
+MARK_RETRY = """
+    UPDATE notification_outbox
+    SET attempts = attempts + 1,
+        last_error = %s,
+        status = CASE WHEN attempts + 1 >= %s THEN 'failed' ELSE 'pending' END,
+        next_attempt_at = NOW() + make_interval(secs => LEAST(%s * power(2, attempts), %s))
+    WHERE id = ANY(%s)
+    RETURNING status
+"""
+
+
+def build_digest(cur, rows):
+    """Turn claimed outbox rows into a digest of reported reviews."""
+    review_ids = sorted({row['payload']['review_id'] for row in rows if row['kind'] == 'reported_review'})
+    reviews = []
+    if review_ids:
+        cur.execute(REPORTED_REVIEW_DETAILS, (review_ids,))
+        reviews = [dict(review) for review in cur.fetchall()]
+    return {"reported_reviews": reviews, "review_ids": review_ids}
+
+
+def format_digest(digest):
+    """Render a digest as an email subject and plain-text body."""
+    reviews = digest["reported_reviews"]
+    subject = f"[Module Guide] {len(reviews)} reported review(s) awaiting moderation"
+    lines = [f"{len(reviews)} review(s) have been reported and require moderation:", ""]
+    for review in reviews:
+        comment = (review["comment"] or "").replace("\n", " ")
+        if len(comment) > 200:
+            comment = comment[:197] + "..."
+        lines.append(
+            f"- #{review['id']} {review['module_code']} {review['module_name']} ({review['academic_year_start_year']}), "
+            f"{review['report_count']} report(s): {comment}"
+        )
+    return subject, "\n".join(lines) + "\n"
+
+
+def send_log(digest):
+    notify_admins_of_reported_reviews(digest["review_ids"])
+
+
+def send_smtp(digest):
+    if not ADMIN_EMAILS:
+        raise RuntimeError("ADMIN_EMAILS is not set")
+    subject, body = format_digest(digest)
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = SMTP_FROM
+    message["To"] = ", ".join(ADMIN_EMAILS)
+    message.set_content(body)
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10) as smtp:
+        smtp.send_message(message)
+
+
+def send_webhook(digest):
+    if not NOTIFY_WEBHOOK_URL:
+        raise RuntimeError("NOTIFY_WEBHOOK_URL is not set")
+    subject, body = format_digest(digest)
+    data = json.dumps({"subject": subject, "text": body, **digest}, default=str).encode()
+    request = urllib.request.Request(NOTIFY_WEBHOOK_URL, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        response.read()
+
+
+CHANNELS = {
+    "log": send_log,
+    "smtp": send_smtp,
+    "webhook": send_webhook,
+}
+
+
+def deliver(digest, channels):
+    """
+    Send a digest to each of the given channels.
+
+    Returns:
+        tuple: (channels that succeeded, error messages of those that failed)
+    """
+    delivered = []
+    errors = []
+    for channel in channels:
+        start = time.perf_counter()
+        try:
+            CHANNELS[channel](digest)
+            delivered.append(channel)
+            outcome = "sent"
+        except Exception as e:
+            logger.warning("Notification channel %s failed: %s", channel, e)
+            errors.append(f"{channel}: {e}")
+            outcome = "failed"
+        metrics.registry.inc("module_guide_notification_delivery_seconds_total", time.perf_counter() - start, channel=channel)
+        metrics.registry.inc("module_guide_notification_digests_total", channel=channel, outcome=outcome)
+    return delivered, errors
+
+
+def _deliver_rows(cur, rows, channels):
+    """Deliver one digest of rows to channels and record the outcome. Returns True if every channel succeeded."""
+    ids = [row['id'] for row in rows]
+    errors = []
+    if channels:
+        delivered, errors = deliver(build_digest(cur, rows), channels)
+        if delivered:
+            cur.execute(RECORD_DELIVERED_CHANNELS, (delivered, ids))
+
+    if errors:
+        cur.execute(MARK_RETRY, ("; ".join(errors)[:1000], NOTIFY_MAX_ATTEMPTS, NOTIFY_RETRY_BASE_SECONDS, NOTIFY_RETRY_MAX_SECONDS, ids))
+        for row in cur.fetchall():
+            metrics.registry.inc("module_guide_notifications_total", outcome="failed" if row['status'] == 'failed' else "retry")
+        return False
+
+    cur.execute(MARK_SENT, (ids,))
+    metrics.registry.inc("module_guide_notifications_total", len(ids), outcome="sent")
+    return True
+
+
+def dispatch_once():
+    """
+    Claim due notifications and deliver them as digests until none are left.
+
+    Rows are grouped by the channels they still need, so a retried row is only
+    sent to the channels that failed before.
+
+    Returns:
+        int: Number of notifications delivered
+    """
+    delivered = 0
+    while True:
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cur.execute(CLAIM_DUE_NOTIFICATIONS, (DIGEST_MAX_ITEMS,))
+            rows = cur.fetchall()
+            if not rows:
+                conn.commit()
+                return delivered
+
+            groups = {}
+            for row in rows:
+                channels = tuple(channel for channel in NOTIFY_CHANNELS if channel not in row['delivered_channels'])
+                groups.setdefault(channels, []).append(row)
+
+            failed = False
+            for channels, group in groups.items():
+                if _deliver_rows(cur, group, channels):
+                    delivered += len(group)
+                else:
+                    failed = True
+            conn.commit()
+            # Back off until the next round rather than claiming more rows while a channel is failing
+            if failed:
+                return delivered
+        finally:
+            cur.close()
+            conn.close()
+
+
+def run_dispatcher(stop_event=None):
+    """Dispatch digests every DIGEST_WINDOW_SECONDS until stop_event is set."""
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            dispatch_once()
+        except Exception:
+            logger.exception("Notification dispatch failed")
+        stop_event.wait(DIGEST_WINDOW_SECONDS)
+
+
+def serve_metrics(port):
+    """Serve the dispatcher's metrics on /metrics in a background thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def serve_stand_in(port):
+    """Run a local webhook receiver that prints every digest it is sent."""
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                print(json.loads(body)["text"], flush=True)
+            except (ValueError, KeyError):
+                print(body.decode(errors="replace"), flush=True)
+            self.send_response(204)
+            self.end_headers()
+
+    print(f"Webhook stand-in listening on http://localhost:{port}/")
+    HTTPServer(("0.0.0.0", port), StandInHandler).serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", choices=["dispatch", "stand-in"], default="dispatch")
+    parser.add_argument("--once", action="store_true", help="Send one round of digests and exit")
+    parser.add_argument("--port", type=int, default=8026, help="Port for the webhook stand-in (8025 is the Mailpit UI)")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "stand-in":
+        serve_stand_in(args.port)
+        return
+
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+
+    if args.once:
+        print(f"Delivered {dispatch_once()} notification(s)")
+    else:
+        run_dispatcher()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""SQL statements shared by the sync (db.py) and async (async_db.py) data layers.
+
+Both psycopg2 and psycopg 3 use ``%s`` and ``%(name)s`` placeholders, so every
+statement here can be executed unchanged by either driver.
+"""
+
+MODULES_BY_CODE = "SELECT * FROM modules WHERE code = %s"
+
+ALL_MODULES = "SELECT * FROM modules ORDER BY code"
+
+SEARCH_MODULES = """
+    SELECT DISTINCT m.*
+    FROM modules m
+    LEFT JOIN module_iterations mi ON m.id = mi.module_id
+    LEFT JOIN module_iterations_lecturers_links mil ON mi.id = mil.module_iteration_id
+    LEFT JOIN lecturers l ON mil.lecturer_id = l.id
+    WHERE
+      m.name ILIKE %s OR
+      m.code ILIKE %s OR
+      l.name ILIKE %s
+    ORDER BY m.code
+"""
+
+CURRENT_YEAR = "SELECT MAX(academic_year_start_year) FROM module_iterations"
+
+ITERATION_FOR_YEAR = "SELECT id FROM module_iterations WHERE module_id = %s AND academic_year_start_year = %s"
+
+ITERATION_COURSES = """
+    SELECT c.id, c.title
+    FROM courses c
+    INNER JOIN module_iterations_courses_links micl ON c.id = micl.course_id
+    WHERE micl.module_iteration_id = %s
+"""
+
+ITERATION_LECTURERS = """
+    SELECT l.id, l.name
+    FROM lecturers l
+    INNER JOIN module_iterations_lecturers_links mil ON l.id = mil.lecturer_id
+    WHERE mil.module_iteration_id = %s
+"""
+
+# Modules with the courses and lecturers of their current year iteration, as json
+_ENRICHED_MODULES = """
+    WITH current_year AS (
+        SELECT MAX(academic_year_start_year) AS year FROM module_iterations
+    )
+    SELECT
+        m.*,
+        COALESCE((
+            SELECT json_agg(json_build_object('id', c.id, 'title', c.title))
+            FROM module_iterations mi
+            INNER JOIN module_iterations_courses_links micl ON mi.id = micl.module_iteration_id
+            INNER JOIN courses c ON c.id = micl.course_id
+            WHERE mi.module_id = m.id
+              AND mi.academic_year_start_year = (SELECT year FROM current_year)
+        ), '[]'::json) AS current_courses,
+        COALESCE((
+            SELECT json_agg(json_build_object('id', l.id, 'name', l.name))
+            FROM module_iterations mi
+            INNER JOIN module_iterations_lecturers_links mil ON mi.id = mil.module_iteration_id
+            INNER JOIN lecturers l ON l.id = mil.lecturer_id
+            WHERE mi.module_id = m.id
+              AND mi.academic_year_start_year = (SELECT year FROM current_year)
+        ), '[]'::json) AS current_lecturers
+    FROM modules m
+"""
+
+ALL_MODULES_ENRICHED = _ENRICHED_MODULES + """
+    ORDER BY m.code
+"""
+
+# Same matches as SEARCH_MODULES, enriched in the same query
+SEARCH_MODULES_ENRICHED = _ENRICHED_MODULES + """
+    WHERE
+      m.name ILIKE %s OR
+      m.code ILIKE %s OR
+      EXISTS (
+        SELECT 1
+        FROM module_iterations mi
+        INNER JOIN module_iterations_lecturers_links mil ON mi.id = mil.module_iteration_id
+        INNER JOIN lecturers l ON mil.lecturer_id = l.id
+        WHERE mi.module_id = m.id AND l.name ILIKE %s
+      )
+    ORDER BY m.code
+"""
+
+ALL_COURSES = "SELECT * FROM courses ORDER BY title"
+
+COURSE_BY_ID = "SELECT * FROM courses WHERE id = %s"
+
+LATEST_COURSE_YEAR = "SELECT MAX(academic_year_start_year) AS year FROM course_module_iterations WHERE course_id = %s"
+
+# One page of a course's modules for a year, from the course_module_iterations view.
+# Ratings are aggregated live for the page's iterations only.
+COURSE_MODULES = """
+    WITH listing AS (
+        SELECT cmi.*, COUNT(*) OVER () AS total
+        FROM course_module_iterations cmi
+        WHERE cmi.course_id = %(course_id)s AND cmi.academic_year_start_year = %(year)s
+        ORDER BY cmi.code, cmi.module_iteration_id
+        LIMIT %(limit)s OFFSET %(offset)s
+    )
+    SELECT
+        l.module_id AS id,
+        l.code,
+        l.name,
+        l.credits,
+        l.module_iteration_id,
+        l.lecturers,
+        ratings.review_count,
+        ratings.average_rating,
+        l.total
+    FROM listing l
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*) AS review_count, ROUND(AVG(r.overall_rating), 2)::float AS average_rating
+        FROM reviews r
+        WHERE r.module_iteration_id = l.module_iteration_id AND r.moderation_status = 'published'
+    ) ratings
+    ORDER BY l.code, l.module_iteration_id
+"""
+
+REFRESH_COURSE_MODULES = "REFRESH MATERIALIZED VIEW CONCURRENTLY course_module_iterations"
+
+MODULE_BY_ID = "SELECT * FROM modules WHERE id = %s"
+
+MODULE_ITERATIONS = "SELECT * FROM module_iterations WHERE module_id = %s"
+
+LECTURERS_FOR_ITERATION = "SELECT * FROM lecturers_from_module_iteration(%s)"
+
+COURSES_FOR_ITERATION = "SELECT * FROM courses_from_module_iteration(%s)"
+
+PUBLISHED_REVIEWS_FOR_ITERATION = "SELECT * FROM reviews WHERE module_iteration_id = %s AND moderation_status = %s"
+
+LIKE_REVIEW = "UPDATE reviews SET like_dislike = like_dislike + 1 WHERE id = %s RETURNING like_dislike"
+
+DISLIKE_REVIEW = "UPDATE reviews SET like_dislike = like_dislike - 1 WHERE id = %s RETURNING like_dislike"
+
+INCREMENT_REPORT_COUNT = "UPDATE reviews SET report_count = report_count + 1 WHERE id = %s"
+
+REPORT_COUNTS = "SELECT report_count, report_tolerance FROM reviews WHERE id = %s"
+
+ENQUEUE_NOTIFICATION = "INSERT INTO notification_outbox (kind, payload) VALUES (%s, %s)"
+
+SET_MODERATION_STATUS = "UPDATE reviews SET moderation_status = %s WHERE id = %s"
+
+INSERT_REVIEW = "INSERT INTO reviews (module_iteration_id, overall_rating, comment, moderation_status, like_dislike) VALUES (%s, %s, %s, %s, 0)"
+
+PENDING_REVIEWS = """
+    SELECT
+        r.*,
+        m.code as module_code,
+        m.name as module_name,
+        mi.academic_year_start_year
+    FROM reviews r
+    INNER JOIN module_iterations mi ON r.module_iteration_id = mi.id
+    INNER JOIN modules m ON mi.module_id = m.id
+    WHERE r.moderation_status != 'published' AND r.moderation_status != 'rejected'
+    ORDER BY r.created_at DESC
+"""
+
+REJECTED_REVIEWS = """
+    SELECT
+        r.*,
+        m.code as module_code,
+        m.name as module_name,
+        mi.academic_year_start_year
+    FROM reviews r
+    INNER JOIN module_iterations mi ON r.module_iteration_id = mi.id
+    INNER JOIN modules m ON mi.module_id = m.id
+    WHERE r.moderation_status = 'rejected'
+    ORDER BY r.created_at DESC
+"""
+
+ACCEPT_REVIEW = "UPDATE reviews SET moderation_status = 'published', report_tolerance = report_tolerance + 2 WHERE id = %s"
+
+REJECT_REVIEW = "UPDATE reviews SET moderation_status = 'rejected' WHERE id = %s"
+
+# Bulk moderation. Each filter is skipped when its parameter is NULL; only
+# reviews still in the moderation queue are touched.
+_BULK_MODERATION_TARGETS = """
+    WITH targets AS (
+        SELECT r.id
+        FROM reviews r
+        INNER JOIN module_iterations mi ON r.module_iteration_id = mi.id
+        WHERE r.moderation_status != 'published' AND r.moderation_status != 'rejected'
+          AND (%(review_ids)s::int[] IS NULL OR r.id = ANY(%(review_ids)s::int[]))
+          AND (%(module_id)s::int IS NULL OR mi.module_id = %(module_id)s::int)
+          AND (%(older_than_days)s::int IS NULL OR r.created_at < NOW() - make_interval(days => %(older_than_days)s::int))
+          AND (%(min_report_count)s::int IS NULL OR r.report_count >= %(min_report_count)s::int)
+        FOR UPDATE OF r
+    )
+"""
+
+BULK_ACCEPT_REVIEWS = _BULK_MODERATION_TARGETS + """
+    UPDATE reviews r
+    SET moderation_status = 'published', report_tolerance = r.report_tolerance + 2
+    FROM targets t
+    WHERE r.id = t.id
+    RETURNING r.id
+"""
+
+BULK_REJECT_REVIEWS = _BULK_MODERATION_TARGETS + """
+    UPDATE reviews r
+    SET moderation_status = 'rejected'
+    FROM targets t
+    WHERE r.id = t.id
+    RETURNING r.id
+"""
+
+EXISTING_REVIEW_IDS = "SELECT id FROM reviews WHERE id = ANY(%s)"
+
+RELATED_MODULES = """
+    SELECT m.id, m.code, m.name, rel.score
+    FROM related_modules r
+    CROSS JOIN LATERAL unnest(r.related_module_ids, r.scores) WITH ORDINALITY AS rel(module_id, score, rank)
+    INNER JOIN modules m ON m.id = rel.module_id
+    WHERE r.module_id = %s
+    ORDER BY rel.rank
+    LIMIT %s
+"""
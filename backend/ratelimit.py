@@ -0,0 +1,455 @@
+"""Rate limiting and duplicate suppression for write endpoints.
+
+Token buckets are kept per client and, for likes and reports, per review, so
+a script hammering one review is throttled even when spread across clients.
+Limits are written as "<requests>/<seconds>", e.g. "20/60" allows bursts of 20
+and refills at 20 tokens per minute.
+
+State lives in a backend chosen by RATE_LIMIT_BACKEND:
+
+- ``memory`` (default): per process, no dependencies.
+- ``redis``: shared by all workers, using REDIS_URL (the redis service in
+  docker-compose.yml is the local stand-in).
+
+If the backend fails, requests are let through and the error is counted.
+
+Submissions carrying an ``Idempotency-Key`` header are recorded. A repeat with
+the same key and the same review returns the stored result without calling
+Gemini again, and a repeat with different content is refused. Without a key,
+identical submissions from the same client within SUBMIT_DEDUP_SECONDS are
+treated the same way.
+"""
+
+import functools
+import hashlib
+import heapq
+import ipaddress
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "").lower() in ("1", "true", "yes")
+# Addresses, networks or host names of proxies whose X-Forwarded-For is believed
+RATE_LIMIT_TRUSTED_PROXIES = [
+    proxy.strip() for proxy in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if proxy.strip()
+]
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+SUBMIT_DEDUP_SECONDS = int(os.getenv("SUBMIT_DEDUP_SECONDS", "60"))
+
+# scope -> (per-client limit, per-review limit)
+LIMITS = {
+    "like": (os.getenv("LIKE_RATE_LIMIT", "30/60"), os.getenv("LIKE_REVIEW_RATE_LIMIT", "120/60")),
+    "report": (os.getenv("REPORT_RATE_LIMIT", "5/60"), os.getenv("REPORT_REVIEW_RATE_LIMIT", "20/60")),
+    "submit": (os.getenv("SUBMIT_RATE_LIMIT", "5/300"), None),
+}
+
+# Memory backend: most buckets, and most idempotency records, kept per process
+MEMORY_MAX_KEYS = 100_000
+# Seconds host names in RATE_LIMIT_TRUSTED_PROXIES are cached after resolving them
+PROXY_RESOLVE_SECONDS = 30
+
+logger = logging.getLogger("module_guide.ratelimit")
+
+metrics.registry.describe("module_guide_rate_limited_total", "counter", "Requests rejected by rate limits.")
+metrics.registry.describe("module_guide_duplicate_submissions_total", "counter", "Submissions short-circuited as duplicates.")
+metrics.registry.describe("module_guide_rate_limit_errors_total", "counter", "Rate limit backend errors (requests let through).")
+
+
+def parse_limit(limit):
+    """Parse "<requests>/<seconds>" into (refill rate per second, capacity)."""
+    requests, seconds = limit.split("/")
+    return int(requests) / float(seconds), int(requests)
+
+
+class MemoryBackend:
+    """
+    In-process token buckets and idempotency records.
+
+    Buckets are kept in least-recently-used order and the oldest is dropped
+    once MEMORY_MAX_KEYS are tracked. Records expire through a heap ordered by
+    expiry time, so neither needs a full scan.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+        self._records = {}
+        self._expiries = []
+
+    def take(self, key, rate, capacity, cost=1):
+        """Take ``cost`` tokens. Returns (allowed, seconds until enough tokens)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (cost - tokens) / rate
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > MEMORY_MAX_KEYS:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def _store(self, key, value, expires):
+        self._records[key] = (value, expires)
+        heapq.heappush(self._expiries, (expires, key))
+        self._expire(time.monotonic())
+
+    def _expire(self, now):
+        # Heap entries left behind by overwritten records are skipped
+        while self._expiries and (self._expiries[0][0] <= now or len(self._records) > MEMORY_MAX_KEYS):
+            expires, key = heapq.heappop(self._expiries)
+            record = self._records.get(key)
+            if record and record[1] == expires:
+                del self._records[key]
+
+    def reserve(self, key, value, ttl):
+        """Store ``value`` under ``key`` unless it is already set. Returns True if stored."""
+        now = time.monotonic()
+        with self._lock:
+            record = self._records.get(key)
+            if record and record[1] > now:
+                return False
+            self._store(key, value, now + ttl)
+            return True
+
+    def get(self, key):
+        with self._lock:
+            record = self._records.get(key)
+        if record and record[1] > time.monotonic():
+            return record[0]
+        return None
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._store(key, value, time.monotonic() + ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._records.pop(key, None)
+
+
+# KEYS[1] bucket; ARGV rate, capacity, cost. Uses the Redis clock so all workers agree.
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+
+class RedisBackend:
+    """Token buckets and idempotency records shared through Redis."""
+
+    def __init__(self, url):
+        import redis
+
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._take = self._redis.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    def take(self, key, rate, capacity, cost=1):
+        allowed, retry_after = self._take(keys=[f"ratelimit:{key}"], args=[rate, capacity, cost])
+        return bool(allowed), float(retry_after)
+
+    def reserve(self, key, value, ttl):
+        return bool(self._redis.set(f"idempotency:{key}", value, nx=True, ex=ttl))
+
+    def get(self, key):
+        return self._redis.get(f"idempotency:{key}")
+
+    def set(self, key, value, ttl):
+        self._redis.set(f"idempotency:{key}", value, ex=ttl)
+
+    def delete(self, key):
+        self._redis.delete(f"idempotency:{key}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the configured backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = RedisBackend(REDIS_URL) if RATE_LIMIT_BACKEND == "redis" else MemoryBackend()
+    return _backend
+
+
+_trusted_networks = None
+_trusted_networks_expire = 0.0
+_trusted_networks_lock = threading.Lock()
+
+
+def _resolve_trusted_proxies():
+    networks = []
+    for proxy in RATE_LIMIT_TRUSTED_PROXIES:
+        try:
+            networks.append(ipaddress.ip_network(proxy, strict=False))
+            continue
+        except ValueError:
+            pass
+        # A host name, such as a docker-compose service whose address can change
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(proxy, None)}
+        except OSError:
+            logger.warning("Could not resolve trusted proxy %s", proxy)
+            continue
+        networks.extend(ipaddress.ip_network(address) for address in addresses)
+    return networks
+
+
+def is_trusted_proxy(address):
+    """Whether address belongs to one of RATE_LIMIT_TRUSTED_PROXIES."""
+    global _trusted_networks, _trusted_networks_expire
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    now = time.monotonic()
+    with _trusted_networks_lock:
+        if _trusted_networks is None or now >= _trusted_networks_expire:
+            _trusted_networks = _resolve_trusted_proxies()
+            _trusted_networks_expire = now + PROXY_RESOLVE_SECONDS
+        networks = _trusted_networks
+    return any(address in network for network in networks)
+
+
+def client_id(request):
+    """
+    Identify the client making a request.
+
+    When RATE_LIMIT_TRUST_FORWARDED is set and the request comes from one of
+    RATE_LIMIT_TRUSTED_PROXIES, this is the last address in X-Forwarded-For:
+    the one the proxy appended. Earlier entries come from the client and could
+    be anything, as could the header on a request that bypassed the proxy.
+    """
+    forwarded = request.headers.get("X-Forwarded-For")
+    if RATE_LIMIT_TRUST_FORWARDED and forwarded and is_trusted_proxy(request.remote_addr or ""):
+        return forwarded.split(",")[-1].strip()
+    return request.remote_addr or "unknown"
+
+
+def check(scope, client, review_id=None):
+    """
+    Take a token from each bucket that applies to a request.
+
+    Returns:
+        float: 0 if the request is allowed, otherwise seconds until retrying may succeed
+    """
+    client_limit, review_limit = LIMITS[scope]
+    buckets = [(f"{scope}:client:{client}", client_limit, "client")]
+    if review_limit and review_id is not None:
+        buckets.append((f"{scope}:review:{review_id}", review_limit, "review"))
+
+    backend = get_backend()
+    for key, limit, key_type in buckets:
+        rate, capacity = parse_limit(limit)
+        try:
+            allowed, retry_after = backend.take(key, rate, capacity)
+        except Exception:
+            logger.exception("Rate limit backend error")
+            metrics.registry.inc("module_guide_rate_limit_errors_total")
+            return 0
+        if not allowed:
+            metrics.registry.inc("module_guide_rate_limited_total", scope=scope, key_type=key_type)
+            return retry_after
+    return 0
+
+
+def _limited(jsonify, retry_after):
+    response = jsonify({"error": "Rate limit exceeded"})
+    response.headers["Retry-After"] = str(max(1, round(retry_after)))
+    return response, 429
+
+
+def limit(scope, review_arg=None):
+    """
+    Decorate a Flask view so requests over the scope's limits get a 429.
+
+    Args:
+        scope (str): Key into LIMITS
+        review_arg (str): Name of the view argument holding the review id, for per-review buckets
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import jsonify, request
+
+            retry_after = check(scope, client_id(request), kwargs.get(review_arg) if review_arg else None)
+            if retry_after:
+                return _limited(jsonify, retry_after)
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def async_limit(scope, review_arg=None):
+    """
+    Decorate a Quart view so requests over the scope's limits get a 429.
+
+    The backend is called on a worker thread, as the Redis client blocks.
+
+    Args:
+        scope (str): Key into LIMITS
+        review_arg (str): Name of the view argument holding the review id, for per-review buckets
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            from quart import jsonify, request
+            from quart.utils import run_sync
+
+            retry_after = await run_sync(check)(scope, client_id(request), kwargs.get(review_arg) if review_arg else None)
+            if retry_after:
+                return _limited(jsonify, retry_after)
+            return await view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def submission_fingerprint(module_iteration_id, rating, text):
+    """Hash the content of a review submission."""
+    payload = json.dumps([str(module_iteration_id), str(rating), text or ""])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _submission_key(request, fingerprint):
+    idempotency_key = request.headers.get("Idempotency-Key")
+    if idempotency_key:
+        return f"submit:key:{idempotency_key}", IDEMPOTENCY_TTL_SECONDS
+    return f"submit:client:{client_id(request)}:{fingerprint}", SUBMIT_DEDUP_SECONDS
+
+
+def _reserve_submission(key, fingerprint, ttl):
+    """
+    Reserve key for a submission.
+
+    Returns:
+        tuple: (ok, stored) where ok is False if the backend failed, and stored is the
+            earlier submission's record, or None if this submission should go ahead
+    """
+    backend = get_backend()
+    try:
+        reserved = backend.reserve(key, json.dumps({"fingerprint": fingerprint, "response": None}), ttl)
+        return True, None if reserved else json.loads(backend.get(key) or "null")
+    except Exception:
+        logger.exception("Idempotency backend error")
+        metrics.registry.inc("module_guide_rate_limit_errors_total")
+        return False, None
+
+
+def _replay_submission(jsonify, stored, fingerprint):
+    if stored["fingerprint"] != fingerprint:
+        return jsonify({"error": "Idempotency-Key was already used for a different submission"}), 409
+    metrics.registry.inc("module_guide_duplicate_submissions_total")
+    if stored["response"] is None:
+        return jsonify({"error": "A submission with this key is still being processed"}), 409
+    response = jsonify(stored["response"])
+    response.headers["Idempotent-Replayed"] = "true"
+    return response, 200
+
+
+def _record_submission(key, fingerprint, ttl, status, body):
+    backend = get_backend()
+    try:
+        if status == 200:
+            backend.set(key, json.dumps({"fingerprint": fingerprint, "response": body}), ttl)
+        else:
+            # Let the client retry failed submissions
+            backend.delete(key)
+    except Exception:
+        logger.exception("Idempotency backend error")
+        metrics.registry.inc("module_guide_rate_limit_errors_total")
+
+
+def idempotent_submission(view):
+    """
+    Decorate the submit view so repeated submissions are answered from the stored result.
+
+    The view's JSON result is stored under the Idempotency-Key header (or, without
+    one, under the client and content) once it succeeds. Concurrent or later
+    repeats get the stored result; a key reused for different content gets a 409.
+    """
+
+    @functools.wraps(view)
+    def wrapper(module_iteration_id):
+        from flask import jsonify, request
+
+        fingerprint = submission_fingerprint(
+            module_iteration_id, request.args.get("overall_rating"), request.form.get("reviewText")
+        )
+        key, ttl = _submission_key(request, fingerprint)
+        ok, stored = _reserve_submission(key, fingerprint, ttl)
+        if not ok:
+            return view(module_iteration_id)
+        if stored is not None:
+            return _replay_submission(jsonify, stored, fingerprint)
+
+        response, status = view(module_iteration_id)
+        _record_submission(key, fingerprint, ttl, status, response.get_json() if status == 200 else None)
+        return response, status
+
+    return wrapper
+
+
+def async_idempotent_submission(view):
+    """Quart version of idempotent_submission."""
+
+    @functools.wraps(view)
+    async def wrapper(module_iteration_id):
+        from quart import jsonify, request
+        from quart.utils import run_sync
+
+        form = await request.form
+        fingerprint = submission_fingerprint(
+            module_iteration_id, request.args.get("overall_rating"), form.get("reviewText")
+        )
+        key, ttl = _submission_key(request, fingerprint)
+        ok, stored = await run_sync(_reserve_submission)(key, fingerprint, ttl)
+        if not ok:
+            return await view(module_iteration_id)
+        if stored is not None:
+            return _replay_submission(jsonify, stored, fingerprint)
+
+        response, status = await view(module_iteration_id)
+        body = await response.get_json() if status == 200 else None
+        await run_sync(_record_submission)(key, fingerprint, ttl, status, body)
+        return response, status
+
+    return wrapper
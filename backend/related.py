@@ -0,0 +1,197 @@
+"""Offline builder for the "related modules" table.
+
+Two modules are related when they are taken on the same courses or taught by
+the same lecturers. The builder reads every module→course and module→lecturer
+link once, builds a sparse module × feature matrix (features are courses and
+lecturers, weighted by inverse document frequency so that very common courses
+count for less), and computes each module's top-k cosine neighbours with
+sparse matrix products over chunks of rows.
+
+The neighbours are stored one row per module in ``related_modules``, so
+/api/relatedModules/<module_id> is a single primary-key lookup. Re-run this
+after importing new catalogue data:
+
+    python related.py --top-k 10
+"""
+
+import argparse
+import io
+import time
+
+from db import get_db_connection
+
+TOP_K = 10
+COURSE_WEIGHT = 1.0
+LECTURER_WEIGHT = 1.5
+MIN_SCORE = 0.05
+CHUNK_SIZE = 512
+
+MODULE_COURSE_PAIRS = """
+    SELECT DISTINCT mi.module_id, micl.course_id
+    FROM module_iterations_courses_links micl
+    INNER JOIN module_iterations mi ON mi.id = micl.module_iteration_id
+"""
+
+MODULE_LECTURER_PAIRS = """
+    SELECT DISTINCT mi.module_id, mil.lecturer_id
+    FROM module_iterations_lecturers_links mil
+    INNER JOIN module_iterations mi ON mi.id = mil.module_iteration_id
+"""
+
+
+def _feature_block(row_index, pairs, n_rows, weight):
+    """Binary module × feature block for one kind of link, weighted by IDF."""
+    import numpy as np
+    from scipy import sparse
+
+    if len(pairs) == 0:
+        return sparse.csr_matrix((n_rows, 0), dtype=np.float32)
+
+    rows = row_index[pairs[:, 0]]
+    features, cols = np.unique(pairs[:, 1], return_inverse=True)
+    block = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n_rows, len(features))
+    )
+    document_frequency = np.bincount(cols, minlength=len(features))
+    idf = np.log((1 + n_rows) / (1 + document_frequency)).astype(np.float32) + 1
+    return block @ sparse.diags(idf * weight)
+
+
+def build_feature_matrix(module_ids, course_pairs, lecturer_pairs):
+    """
+    Build the L2-normalised sparse module × feature matrix.
+
+    Args:
+        module_ids (ndarray): Module ids, one per matrix row
+        course_pairs (ndarray): (module_id, course_id) rows
+        lecturer_pairs (ndarray): (module_id, lecturer_id) rows
+
+    Returns:
+        scipy.sparse.csr_matrix: One row per entry of module_ids
+    """
+    import numpy as np
+    from scipy import sparse
+
+    row_index = np.full(int(module_ids.max()) + 1 if len(module_ids) else 1, -1, dtype=np.int64)
+    row_index[module_ids] = np.arange(len(module_ids))
+
+    features = sparse.hstack([
+        _feature_block(row_index, course_pairs, len(module_ids), COURSE_WEIGHT),
+        _feature_block(row_index, lecturer_pairs, len(module_ids), LECTURER_WEIGHT),
+    ]).tocsr()
+
+    norms = np.sqrt(np.asarray(features.multiply(features).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return (sparse.diags(1.0 / norms).astype(np.float32) @ features).tocsr()
+
+
+def top_k_neighbours(features, k=TOP_K, min_score=MIN_SCORE, chunk_size=CHUNK_SIZE):
+    """
+    Compute each row's k most similar other rows by cosine similarity.
+
+    Similarities are computed chunk_size rows at a time, so peak memory is
+    bounded by one chunk of the (sparse) similarity matrix.
+
+    Returns:
+        tuple: (neighbours, scores) arrays of shape (n, k); unused slots hold -1 and 0
+    """
+    import numpy as np
+
+    n = features.shape[0]
+    neighbours = np.full((n, k), -1, dtype=np.int64)
+    scores = np.zeros((n, k), dtype=np.float32)
+    transposed = features.T.tocsc()
+
+    for start in range(0, n, chunk_size):
+        end = min(start + chunk_size, n)
+        similarities = (features[start:end] @ transposed).tocsr()
+        for i in range(end - start):
+            lo, hi = similarities.indptr[i], similarities.indptr[i + 1]
+            cols = similarities.indices[lo:hi]
+            values = similarities.data[lo:hi]
+            keep = (cols != start + i) & (values >= min_score)
+            cols, values = cols[keep], values[keep]
+            if len(values) > k:
+                best = np.argpartition(-values, k - 1)[:k]
+                cols, values = cols[best], values[best]
+            order = np.lexsort((cols, -values))
+            neighbours[start + i, :len(order)] = cols[order]
+            scores[start + i, :len(order)] = values[order]
+
+    return neighbours, scores
+
+
+def _load_pairs(cur, query):
+    import numpy as np
+
+    cur.execute(query)
+    return np.array(cur.fetchall(), dtype=np.int64).reshape(-1, 2)
+
+
+def refresh_related_modules(top_k=TOP_K, min_score=MIN_SCORE):
+    """
+    Rebuild the related_modules table from the current catalogue.
+
+    The new rows are loaded into a staging table and swapped in within one
+    transaction, so readers keep seeing the previous neighbours until commit.
+
+    Returns:
+        dict: Row count and timings of each stage
+    """
+    import numpy as np
+
+    timings = {}
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        start = time.perf_counter()
+        cur.execute("SELECT id FROM modules ORDER BY id")
+        module_ids = np.array([row[0] for row in cur.fetchall()], dtype=np.int64)
+        course_pairs = _load_pairs(cur, MODULE_COURSE_PAIRS)
+        lecturer_pairs = _load_pairs(cur, MODULE_LECTURER_PAIRS)
+        timings["load_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        features = build_feature_matrix(module_ids, course_pairs, lecturer_pairs)
+        neighbours, scores = top_k_neighbours(features, top_k, min_score)
+        timings["compute_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        buffer = io.StringIO()
+        rows = 0
+        for row, module_id in enumerate(module_ids):
+            found = neighbours[row] >= 0
+            if not found.any():
+                continue
+            related_ids = ",".join(str(module_ids[col]) for col in neighbours[row][found])
+            related_scores = ",".join(f"{score:.4f}" for score in scores[row][found])
+            buffer.write(f"{module_id}\t{{{related_ids}}}\t{{{related_scores}}}\n")
+            rows += 1
+        buffer.seek(0)
+
+        cur.execute("CREATE TEMP TABLE related_modules_staging (LIKE related_modules INCLUDING DEFAULTS) ON COMMIT DROP")
+        cur.copy_expert("COPY related_modules_staging (module_id, related_module_ids, scores) FROM STDIN", buffer)
+        cur.execute("DELETE FROM related_modules")
+        cur.execute("INSERT INTO related_modules SELECT * FROM related_modules_staging")
+        conn.commit()
+        timings["store_seconds"] = time.perf_counter() - start
+    finally:
+        cur.close()
+        conn.close()
+
+    return {"modules": len(module_ids), "rows": rows, **{key: round(value, 3) for key, value in timings.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--min-score", type=float, default=MIN_SCORE)
+    args = parser.parse_args()
+
+    summary = refresh_related_modules(args.top_k, args.min_score)
+    print(f"Stored neighbours for {summary['rows']} of {summary['modules']} modules "
+          f"(load {summary['load_seconds']}s, compute {summary['compute_seconds']}s, store {summary['store_seconds']}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Read/write splitting between the primary database and read replicas.
+
+Read-only helpers in db.py ask the router for a connection with
+``connect_read``; everything else goes to the primary. Replicas are used
+round-robin. A replica that refuses connections, has lost its replication
+stream, or lags the primary by more than MAX_REPLICA_LAG_SECONDS, is skipped
+for REPLICA_RETRY_SECONDS. When no replica is usable, reads fall back to the
+primary.
+
+Read-your-writes: a request that opened a primary connection for writing sets
+a short-lived cookie. Requests from the same client carrying that cookie read
+from the primary until it expires, so users see their own likes, reports and
+submissions even if the replicas are behind.
+
+ReplicaRouter opens psycopg2 connections for app.py; AsyncReplicaRouter
+borrows from psycopg 3 pools for async_app.py, with the same health checks
+and cookie.
+"""
+
+import contextvars
+import itertools
+import os
+import threading
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+
+import psycopg2
+
+import metrics
+
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+REPLICA_HEALTH_CHECK_SECONDS = float(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", "5"))
+MAX_REPLICA_LAG_SECONDS = float(os.getenv("MAX_REPLICA_LAG_SECONDS", "10"))
+# Seconds the async app waits for a pooled replica connection before using another
+REPLICA_POOL_TIMEOUT_SECONDS = float(os.getenv("REPLICA_POOL_TIMEOUT_SECONDS", "2"))
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+PRIMARY_PIN_COOKIE = "primary_pin"
+
+# Seconds of replay lag; 0 when the replica has replayed everything it received.
+# NULL when the WAL receiver is not streaming: the replica then receives nothing
+# new, so having replayed everything says nothing about how stale it is. The
+# receiver's status is only visible to superusers and pg_read_all_stats members.
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END AS lag
+"""
+
+metrics.registry.describe("module_guide_db_reads_total", "counter", "Read-only connections by target.")
+metrics.registry.describe("module_guide_db_replica_failures_total", "counter", "Replicas taken out of rotation.")
+
+_pinned_to_primary = contextvars.ContextVar("pinned_to_primary", default=False)
+_wrote = contextvars.ContextVar("wrote", default=False)
+
+
+def pin_to_primary():
+    """Send all reads in the current context to the primary."""
+    _pinned_to_primary.set(True)
+
+
+def record_write():
+    """Note that the current context opened a connection for writing."""
+    _wrote.set(True)
+
+
+class Replica:
+    """A read replica and its health state."""
+
+    def __init__(self, url, pool=None):
+        self.url = url
+        self.pool = pool
+        self.down_until = 0.0
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def available(self, now):
+        return now >= self.down_until
+
+    def mark_down(self, now, reason):
+        self.down_until = now + REPLICA_RETRY_SECONDS
+        metrics.registry.inc("module_guide_db_replica_failures_total", reason=reason)
+
+    def start_check(self, now):
+        """Whether the caller should re-check lag; only one caller at a time gets True."""
+        return now - self.checked_at >= REPLICA_HEALTH_CHECK_SECONDS and self.lock.acquire(blocking=False)
+
+    def finish_check(self, now, lag):
+        """Record the result of REPLICA_LAG_QUERY. Returns whether the replica may be used."""
+        self.checked_at = now
+        if lag is None or float(lag) > MAX_REPLICA_LAG_SECONDS:
+            self.mark_down(now, "lag" if lag is not None else "not_streaming")
+            return False
+        return True
+
+
+class ReplicaRouter:
+    """Hands out primary or replica connections."""
+
+    def __init__(self, primary_url, replica_urls, connect):
+        """
+        Args:
+            primary_url (str): Connection string of the primary
+            replica_urls (list): Connection strings of the read replicas
+            connect (callable): Opens a connection from a connection string
+        """
+        self.primary_url = primary_url
+        self.replicas = [Replica(url) for url in replica_urls]
+        self._connect = connect
+        self._next = itertools.count()
+
+    def connect_primary(self):
+        return self._connect(self.primary_url)
+
+    def connect_read(self):
+        """Return a connection for read-only work, preferring a healthy replica."""
+        if self.replicas and not _pinned_to_primary.get():
+            start = next(self._next)
+            for i in range(len(self.replicas)):
+                replica = self.replicas[(start + i) % len(self.replicas)]
+                conn = self._connect_replica(replica)
+                if conn is not None:
+                    metrics.registry.inc("module_guide_db_reads_total", target="replica")
+                    return conn
+
+        metrics.registry.inc("module_guide_db_reads_total", target="primary")
+        return self.connect_primary()
+
+    def _connect_replica(self, replica):
+        now = time.monotonic()
+        if not replica.available(now):
+            return None
+
+        try:
+            conn = self._connect(replica.url)
+        except psycopg2.OperationalError:
+            replica.mark_down(now, "connect")
+            return None
+
+        # Only one request per replica re-checks lag; others use the last result
+        if replica.start_check(now):
+            try:
+                cur = conn.cursor()
+                cur.execute(REPLICA_LAG_QUERY)
+                lag = cur.fetchone()[0]
+                cur.close()
+                conn.rollback()
+                if not replica.finish_check(now, lag):
+                    conn.close()
+                    return None
+            except psycopg2.Error:
+                replica.mark_down(now, "health_check")
+                conn.close()
+                return None
+            finally:
+                replica.lock.release()
+
+        return conn
+
+
+class AsyncReplicaRouter:
+    """Hands out pooled primary or replica connections to async code."""
+
+    def __init__(self, primary_pool, replica_pools):
+        """
+        Args:
+            primary_pool (AsyncConnectionPool): Pool of primary connections
+            replica_pools (dict): Pools of read replica connections by connection string
+        """
+        self.primary_pool = primary_pool
+        self.replicas = [Replica(url, pool) for url, pool in replica_pools.items()]
+        self._next = itertools.count()
+
+    @asynccontextmanager
+    async def connection(self, readonly=False):
+        """Borrow a connection, from a healthy replica if readonly, otherwise from the primary."""
+        async with AsyncExitStack() as stack:
+            conn = None
+            if not readonly:
+                record_write()
+            else:
+                if self.replicas and not _pinned_to_primary.get():
+                    start = next(self._next)
+                    for i in range(len(self.replicas)):
+                        conn = await self._enter_replica(stack, self.replicas[(start + i) % len(self.replicas)])
+                        if conn is not None:
+                            break
+                metrics.registry.inc("module_guide_db_reads_total", target="replica" if conn is not None else "primary")
+
+            if conn is None:
+                conn = await stack.enter_async_context(self.primary_pool.connection())
+            yield conn
+
+    async def _enter_replica(self, stack, replica):
+        import psycopg
+        from psycopg_pool import PoolTimeout
+
+        now = time.monotonic()
+        if not replica.available(now):
+            return None
+
+        borrowed = AsyncExitStack()
+        try:
+            conn = await borrowed.enter_async_context(replica.pool.connection(timeout=REPLICA_POOL_TIMEOUT_SECONDS))
+        except (PoolTimeout, psycopg.OperationalError):
+            replica.mark_down(now, "connect")
+            return None
+
+        if replica.start_check(now):
+            try:
+                cur = await conn.execute(REPLICA_LAG_QUERY)
+                row = await cur.fetchone()
+                lag = row["lag"] if isinstance(row, dict) else row[0]
+                await conn.rollback()
+                if not replica.finish_check(now, lag):
+                    await borrowed.aclose()
+                    return None
+            except psycopg.Error:
+                replica.mark_down(now, "health_check")
+                await borrowed.aclose()
+                return None
+            finally:
+                replica.lock.release()
+
+        stack.push_async_exit(borrowed)
+        return conn
+
+
+def _apply_primary_pin(cookies):
+    _wrote.set(False)
+    _pinned_to_primary.set(False)
+    try:
+        pinned_until = float(cookies.get(PRIMARY_PIN_COOKIE, 0))
+    except ValueError:
+        pinned_until = 0
+    if pinned_until > time.time():
+        pin_to_primary()
+
+
+def _set_primary_pin(response):
+    if _wrote.get():
+        response.set_cookie(
+            PRIMARY_PIN_COOKIE,
+            str(time.time() + READ_YOUR_WRITES_SECONDS),
+            max_age=READ_YOUR_WRITES_SECONDS,
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+
+def init_app(app):
+    """Register the read-your-writes cookie hooks on a Flask app."""
+
+    @app.before_request
+    def apply_primary_pin():
+        from flask import request
+
+        _apply_primary_pin(request.cookies)
+
+    @app.after_request
+    def set_primary_pin(response):
+        return _set_primary_pin(response)
+
+
+def init_async_app(app):
+    """
+    Register the read-your-writes cookie hooks on a Quart app.
+
+    Writes must run in the request's own task rather than one started with
+    asyncio.gather, or the cookie is not set.
+    """
+
+    @app.before_request
+    async def apply_primary_pin():
+        from quart import request
+
+        _apply_primary_pin(request.cookies)
+
+    @app.after_request
+    async def set_primary_pin(response):
+        return _set_primary_pin(response)
@@ -51,3 +51,39 @@ CREATE TABLE IF NOT EXISTS reviews (
   report_count INT DEFAULT 0,
   like_dislike INT DEFAULT 0
 );
+
+-- Notifications written in the same transaction as the change that caused them,
+-- delivered later in digests by notifications.py
+CREATE TABLE IF NOT EXISTS notification_outbox (
+  id SERIAL PRIMARY KEY,
+  kind VARCHAR(50) NOT NULL,
+  payload JSONB NOT NULL,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  status VARCHAR(20) NOT NULL DEFAULT 'pending',
+  attempts INT NOT NULL DEFAULT 0,
+  next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  last_error TEXT,
+  -- Channels the notification has reached, so retries skip them
+  delivered_channels TEXT[] NOT NULL DEFAULT '{}',
+  sent_at TIMESTAMP
+);
+
+ALTER TABLE notification_outbox ADD COLUMN IF NOT EXISTS delivered_channels TEXT[] NOT NULL DEFAULT '{}';
+
+CREATE INDEX IF NOT EXISTS notification_outbox_pending_idx
+  ON notification_outbox (next_attempt_at) WHERE status = 'pending';
+
+-- Precomputed top-k similar modules, rebuilt by related.py after imports
+CREATE TABLE IF NOT EXISTS related_modules (
+  module_id INT PRIMARY KEY REFERENCES modules(id) ON DELETE CASCADE,
+  related_module_ids INT[] NOT NULL,
+  scores REAL[] NOT NULL,
+  built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Rating aggregates per iteration only look at published reviews
+CREATE INDEX IF NOT EXISTS reviews_published_iteration_idx
+  ON reviews (module_iteration_id) INCLUDE (overall_rating) WHERE moderation_status = 'published';
+
+-- Incremental exports select reviews by creation time (export.py)
+CREATE INDEX IF NOT EXISTS reviews_created_at_idx ON reviews (created_at);
@@ -0,0 +1,27 @@
+-- Course -> module iteration index for /api/courses/<course_id>/modules.
+-- Lecturers are folded in so a course page is read from one view; refresh after
+-- importing catalogue data (db.refresh_course_modules):
+--   REFRESH MATERIALIZED VIEW CONCURRENTLY course_module_iterations;
+CREATE MATERIALIZED VIEW IF NOT EXISTS course_module_iterations AS
+SELECT DISTINCT ON (micl.course_id, mi.id)
+  micl.course_id,
+  mi.academic_year_start_year,
+  mi.id AS module_iteration_id,
+  m.id AS module_id,
+  m.code,
+  m.name,
+  m.credits,
+  COALESCE((
+    SELECT json_agg(json_build_object('id', l.id, 'name', l.name) ORDER BY l.name)
+    FROM module_iterations_lecturers_links mil
+    INNER JOIN lecturers l ON l.id = mil.lecturer_id
+    WHERE mil.module_iteration_id = mi.id
+  ), '[]'::json) AS lecturers
+FROM module_iterations_courses_links micl
+INNER JOIN module_iterations mi ON mi.id = micl.module_iteration_id
+INNER JOIN modules m ON m.id = mi.module_id
+ORDER BY micl.course_id, mi.id;
+
+-- Unique so the view can be refreshed concurrently; column order matches the listing's sort
+CREATE UNIQUE INDEX IF NOT EXISTS course_module_iterations_listing_idx
+  ON course_module_iterations (course_id, academic_year_start_year, code, module_iteration_id);
@@ -0,0 +1,52 @@
+"""Streamed {"<key>": [...]} responses must be valid JSON for any number of rows."""
+
+import asyncio
+import json
+
+import pytest
+
+from jsonstream import iter_json_list
+
+CHUNK_ROWS = 3
+ROW_COUNTS = [0, 1, CHUNK_ROWS - 1, CHUNK_ROWS, CHUNK_ROWS + 1, 2 * CHUNK_ROWS]
+
+
+def rows(count):
+    return [{"id": i, "name": f"row {i}"} for i in range(count)]
+
+
+@pytest.mark.parametrize("count", ROW_COUNTS)
+def test_iter_json_list(count):
+    body = "".join(iter_json_list("items", iter(rows(count)), chunk_rows=CHUNK_ROWS))
+    assert json.loads(body) == {"items": rows(count)}
+
+
+@pytest.mark.parametrize("count", ROW_COUNTS)
+def test_flask_stream_json_list(count, monkeypatch):
+    import jsonstream
+    from app import app, stream_json_list
+
+    monkeypatch.setattr(jsonstream, "STREAM_CHUNK_ROWS", CHUNK_ROWS)
+    with app.test_request_context():
+        response = stream_json_list("modules", iter(rows(count)))
+        body = response.get_data(as_text=True)
+    assert json.loads(body) == {"modules": rows(count)}
+
+
+@pytest.mark.parametrize("count", ROW_COUNTS)
+def test_quart_stream_json_list(count, monkeypatch):
+    import jsonstream
+    from async_app import app, stream_json_list
+
+    monkeypatch.setattr(jsonstream, "STREAM_CHUNK_ROWS", CHUNK_ROWS)
+
+    async def aiter_rows():
+        for row in rows(count):
+            yield row
+
+    async def stream():
+        async with app.test_request_context("/"):
+            response = await stream_json_list("modules", aiter_rows())
+            return await response.get_data(as_text=True)
+
+    assert json.loads(asyncio.run(stream())) == {"modules": rows(count)}
@@ -0,0 +1,16 @@
+"""Startup budgets from benchmarks/startup.py, enforced on every test run."""
+
+import pytest
+
+from benchmarks.startup import BUDGETS_MS, measure
+
+
+@pytest.mark.parametrize("target", sorted(BUDGETS_MS))
+def test_import_within_budget(target):
+    result = measure(target, runs=3, top=5)
+
+    assert result["lazy_packages_imported"] == [], f"{target} imports lazily loaded packages at startup"
+    assert result["import_ms"] <= BUDGETS_MS[target], (
+        f"{target} took {result['import_ms']}ms to import (budget {BUDGETS_MS[target]}ms); "
+        f"slowest imports: {result['slowest']}"
+    )
@@ -11,6 +11,9 @@ export default defineConfig({
         target: process.env.VITE_BACKEND_URL || `http://backend:5000`,
         changeOrigin: true,
         secure: false,
+        // Pass the browser's address on in X-Forwarded-For, so the backend's
+        // rate limits apply per user rather than to the proxy
+        xfwd: true,
       }
     },
     port: 5173,